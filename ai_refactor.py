@@ -1,32 +1,26 @@
-from typing import Dict, List, Tuple
-import re
-import ast
+from typing import Any, Dict, List, Optional, Tuple, Union
+from parsed_source import ParsedSource
+from refactor_benchmark import RefactorBenchmark
+from refactor_transforms import apply_refactors
 
 class AIRefactorEngine:
     """Provides intelligent code refactoring suggestions and optimizations"""
     
     def __init__(self):
+        # Rewrites are matched structurally on the syntax tree (see refactor_transforms)
         self.refactor_patterns = {
-            'while_to_for': {
-                'pattern': r'(\w+)\s*=\s*0\s*\n\s*while\s+\1\s*<\s*len\s*\(\s*(\w+)\s*\)\s*:\s*\n(.*?)\n\s*\1\s*\+\=\s*1',
-                'template': 'for {item} in {collection}:\n{body}'
-            },
-            'range_len_to_enumerate': {
-                'pattern': r'for\s+(\w+)\s+in\s+range\s*\(\s*len\s*\(\s*(\w+)\s*\)\s*\)\s*:\s*\n\s*(.+)\[\1\]',
-                'template': 'for {index}, {item} in enumerate({collection}):\n    # Use {item} instead of {collection}[{index}]'
-            },
-            'list_append_to_comprehension': {
-                'pattern': r'(\w+)\s*=\s*\[\]\s*\n\s*for\s+(\w+)\s+in\s+(\w+)\s*:\s*\n\s*\1\.append\s*\(\s*(.+)\s*\)',
-                'template': '{result} = [{expression} for {item} in {collection}]'
-            }
+            'while_to_for': 'i = 0; while i < len(items): ...; i += 1  →  for item in items: ...',
+            'range_len_to_enumerate': 'for i in range(len(items)): ... items[i] ...  →  for i, item in enumerate(items): ...',
+            'list_append_to_comprehension': 'result = []; for x in xs: result.append(f(x))  →  result = [f(x) for x in xs]'
         }
     
-    def generate_refactored_code(self, original_code: str, analysis_results: Dict) -> Dict[str, any]:
+    def generate_refactored_code(self, original_code: Union[str, ParsedSource], analysis_results: Dict) -> Dict[str, any]:
         """Generate refactored version of the code with improvements"""
         refactored_sections = {}
+        source = ParsedSource.ensure(original_code)
         
         # Apply basic optimizations
-        optimized_code = self._apply_basic_optimizations(original_code, analysis_results)
+        optimization = self._apply_basic_optimizations(source, analysis_results)
         
         # Generate specific improvements for each issue type
         issues = analysis_results.get('issues', [])
@@ -34,65 +28,32 @@ class AIRefactorEngine:
         for issue in issues:
             if issue['type'] == 'while_loop':
                 refactored_sections[f"while_loop_line_{issue['line']}"] = self._refactor_while_loop(
-                    original_code, issue['line']
+                    source, issue['line']
                 )
             elif issue['type'] == 'inefficient_range_len':
                 refactored_sections[f"range_len_line_{issue['line']}"] = self._refactor_range_len(
-                    original_code, issue['line']
+                    source, issue['line']
                 )
             elif issue['type'] == 'unused_import':
                 refactored_sections[f"unused_import_line_{issue['line']}"] = self._remove_unused_import(
-                    original_code, issue['line']
+                    source, issue['line']
                 )
         
         return {
-            'optimized_full_code': optimized_code,
+            'optimized_full_code': optimization['code'],
+            'applied_refactors': optimization['applied'],
             'specific_improvements': refactored_sections,
-            'improvement_summary': self._generate_improvement_summary(issues)
+            'improvement_summary': self._generate_improvement_summary(issues, optimization['applied'])
         }
     
-    def _apply_basic_optimizations(self, code: str, analysis_results: Dict) -> str:
-        """Apply basic code optimizations"""
-        lines = code.split('\n')
-        optimized_lines = []
-        
-        for i, line in enumerate(lines):
-            optimized_line = line
-            
-            # Replace range(len()) with enumerate or direct iteration
-            if 'range(len(' in line and 'for ' in line:
-                optimized_line = self._optimize_range_len_pattern(line)
-            
-            # Suggest list comprehension for simple append patterns
-            elif '.append(' in line and i > 0 and 'for ' in lines[i-1]:
-                # This is a simple heuristic - in practice, this would need more sophisticated parsing
-                optimized_line = line + "  # Consider using list comprehension"
-            
-            optimized_lines.append(optimized_line)
-        
-        return '\n'.join(optimized_lines)
+    def _apply_basic_optimizations(self, source: ParsedSource, analysis_results: Dict) -> Dict[str, Any]:
+        """Apply the safe AST rewrites (while→for, range(len)→enumerate, append loop→comprehension)"""
+        return apply_refactors(source)
     
-    def _optimize_range_len_pattern(self, line: str) -> str:
-        """Optimize range(len()) patterns"""
-        # Simple regex replacement for common patterns
-        pattern = r'for\s+(\w+)\s+in\s+range\s*\(\s*len\s*\(\s*(\w+)\s*\)\s*\):'
-        match = re.search(pattern, line)
-        
-        if match:
-            index_var = match.group(1)
-            collection_var = match.group(2)
-            indent = len(line) - len(line.lstrip())
-            spacing = ' ' * indent
-            
-            return f"{spacing}# Optimized: Use enumerate() or direct iteration\n{spacing}for {index_var}, item in enumerate({collection_var}):"
-        
-        return line
-    
-    def _refactor_while_loop(self, code: str, line_number: int) -> str:
+    def _refactor_while_loop(self, source: ParsedSource, line_number: int) -> str:
         """Generate refactored version of while loop"""
-        lines = code.split('\n')
-        if line_number <= len(lines):
-            original_line = lines[line_number - 1]
+        if line_number <= len(source.lines):
+            original_line = source.line(line_number)
             
             # Simple while loop to for loop conversion example
             if 'while' in original_line and 'len(' in original_line:
@@ -111,7 +72,7 @@ for i, item in enumerate(items):
         
         return "# Refactoring suggestion: Consider using for loop or list comprehension"
     
-    def _refactor_range_len(self, code: str, line_number: int) -> str:
+    def _refactor_range_len(self, source: ParsedSource, line_number: int) -> str:
         """Generate refactored version of range(len()) pattern"""
         return """# Original inefficient pattern:
 # for i in range(len(items)):
@@ -125,16 +86,15 @@ for item in items:
 for i, item in enumerate(items):
     print(f"{i}: {item}")"""
     
-    def _remove_unused_import(self, code: str, line_number: int) -> str:
+    def _remove_unused_import(self, source: ParsedSource, line_number: int) -> str:
         """Show code with unused import removed"""
-        lines = code.split('\n')
-        if line_number <= len(lines):
-            import_line = lines[line_number - 1]
+        if line_number <= len(source.lines):
+            import_line = source.line(line_number)
             return f"# Remove this unused import:\n# {import_line.strip()}\n\n# This reduces memory footprint and improves startup time"
         
         return "# Remove unused import to optimize memory usage"
     
-    def _generate_improvement_summary(self, issues: List[Dict]) -> List[str]:
+    def _generate_improvement_summary(self, issues: List[Dict], applied: List[Dict]) -> List[str]:
         """Generate summary of improvements made"""
         improvements = []
         
@@ -143,11 +103,18 @@ for i, item in enumerate(items):
             issue_type = issue['type']
             issue_counts[issue_type] = issue_counts.get(issue_type, 0) + 1
         
-        if issue_counts.get('while_loop', 0) > 0:
-            improvements.append(f"Converted {issue_counts['while_loop']} while loop(s) to more efficient for loops")
+        applied_counts = {}
+        for refactor in applied:
+            applied_counts[refactor['type']] = applied_counts.get(refactor['type'], 0) + 1
+        
+        if applied_counts.get('while_to_for', 0) > 0:
+            improvements.append(f"Converted {applied_counts['while_to_for']} while loop(s) to more efficient for loops")
+        
+        if applied_counts.get('range_len_to_enumerate', 0) > 0:
+            improvements.append(f"Optimized {applied_counts['range_len_to_enumerate']} range(len()) pattern(s) with direct iteration")
         
-        if issue_counts.get('inefficient_range_len', 0) > 0:
-            improvements.append(f"Optimized {issue_counts['inefficient_range_len']} range(len()) pattern(s) with direct iteration")
+        if applied_counts.get('list_append_to_comprehension', 0) > 0:
+            improvements.append(f"Replaced {applied_counts['list_append_to_comprehension']} append loop(s) with list comprehensions")
         
         if issue_counts.get('unused_import', 0) > 0:
             improvements.append(f"Removed {issue_counts['unused_import']} unused import(s) to reduce memory footprint")
@@ -223,18 +190,43 @@ def calculate(x):
             }
         }
     
-    def calculate_improvement_metrics(self, original_analysis: Dict, optimized_analysis: Dict) -> Dict[str, any]:
-        """Calculate metrics showing improvement from refactoring"""
+    def validate_refactor(self, original_code: str, refactored_code: str, function_name: str,
+                          inputs: Optional[List[List[Any]]] = None,
+                          benchmark: Optional[RefactorBenchmark] = None) -> Dict[str, Any]:
+        """Benchmark a refactored function against the original and decide whether to keep it
+        
+        The refactor is accepted only if it returns the same results for every input
+        and is not measurably slower.
+        """
+        report = (benchmark or RefactorBenchmark()).compare(original_code, refactored_code, function_name, inputs)
+        report['accepted'] = report['verdict'] in ('faster', 'inconclusive')
+        return report
+    
+    def calculate_improvement_metrics(self, original_analysis: Dict, optimized_analysis: Dict,
+                                      benchmark_report: Optional[Dict[str, Any]] = None) -> Dict[str, any]:
+        """Calculate metrics showing improvement from refactoring
+        
+        When a benchmark report from validate_refactor is given, performance_gain is
+        the measured speedup instead of an estimate from the score change.
+        """
         original_score = original_analysis.get('green_score', 0)
         optimized_score = optimized_analysis.get('green_score', 0)
         
         original_issues = len(original_analysis.get('issues', []))
         optimized_issues = len(optimized_analysis.get('issues', []))
         
-        return {
+        metrics = {
             'score_improvement': optimized_score - original_score,
             'issues_fixed': original_issues - optimized_issues,
             'performance_gain': f"{((optimized_score - original_score) / 100 * 100):.1f}%",
             'efficiency_boost': original_issues - optimized_issues,
             'estimated_energy_savings': f"{(original_issues - optimized_issues) * 2.5:.1f} μJ"
-        }
\ No newline at end of file
+        }
+        
+        if benchmark_report is not None and 'speedup' in benchmark_report:
+            low, high = benchmark_report['speedup_interval']
+            metrics['performance_gain'] = f"{(benchmark_report['speedup'] - 1) * 100:.1f}%"
+            metrics['speedup_interval'] = f"{low:.2f}x - {high:.2f}x"
+            metrics['benchmark_verdict'] = benchmark_report['verdict']
+        
+        return metrics
\ No newline at end of file
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from issues import to_jsonable
+
+class AnalysisCache:
+    """Content-addressed cache for analysis results with a memory LRU tier and an optional disk tier"""
+
+    def __init__(self, max_memory_entries: int = 512, cache_dir: Optional[str] = None,
+                 max_disk_bytes: int = 256 * 1024 * 1024):
+        self.max_memory_entries = max_memory_entries
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+
+        # Values are stored as JSON text so every hit returns a fresh copy
+        self._memory: 'OrderedDict[str, str]' = OrderedDict()
+        self._disk_index: Optional[Dict[str, int]] = None  # Path -> size, loaded on first disk write
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Build a SHA-256 cache key from the content hash, rule-set version and parameters"""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(str(part).encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Look up a cached value, promoting disk hits into memory"""
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+
+        if payload is None and self.cache_dir:
+            payload = self._read_disk(key)
+            if payload is not None:
+                self._remember(key, payload)
+
+        if payload is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(payload)
+
+    def set(self, key: str, value: Any):
+        """Store a JSON-serializable value in both tiers"""
+        payload = json.dumps(value, default=to_jsonable)
+        self._remember(key, payload)
+        if self.cache_dir:
+            self._write_disk(key, payload)
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def _remember(self, key: str, payload: str):
+        with self._lock:
+            self._memory[key] = payload
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                payload = f.read()
+            os.utime(path)  # Refresh recency for LRU eviction
+            return payload
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, payload: str):
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write atomically so concurrent scan workers never read a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        size = len(payload.encode('utf-8'))
+        with self._lock:
+            self._load_disk_index()
+            self._disk_bytes += size - self._disk_index.get(path, 0)
+            self._disk_index[path] = size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _load_disk_index(self):
+        if self._disk_index is not None:
+            return
+
+        self._disk_index = {}
+        self._disk_bytes = 0
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if filename.endswith('.json'):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        size = os.path.getsize(path)
+                    except OSError:
+                        continue
+                    self._disk_index[path] = size
+                    self._disk_bytes += size
+
+    def _evict_disk(self):
+        """Remove least recently used entries until the disk tier is under 90% of its limit"""
+        target = self.max_disk_bytes * 0.9
+
+        def last_used(path):
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return 0
+
+        for path in sorted(self._disk_index, key=last_used):
+            if self._disk_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._disk_bytes -= self._disk_index.pop(path)
+
+_shared_cache: Optional[AnalysisCache] = None
+
+def get_shared_cache() -> AnalysisCache:
+    """Process-wide cache, with a disk tier when GREENCODE_CACHE_DIR is set"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = AnalysisCache(cache_dir=os.getenv('GREENCODE_CACHE_DIR'))
+    return _shared_cache
@@ -1,125 +1,145 @@
-import ast
 import re
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Union
+from parsed_source import ParsedSource
+from rules import RULESET_VERSION, run_rules
+from analysis_cache import AnalysisCache
+from issues import Issue, rule_info
+
+RANGE_LEN_RULE = rule_info(
+    'inefficient_range_len', 'inefficient_range_len',
+    'Using range(len(...)) instead of direct iteration',
+    'Consider using "for item in collection:" or enumerate()'
+)
+LIST_RANGE_RULE = rule_info(
+    'unnecessary_list_conversion', 'unnecessary_list_conversion',
+    'Converting range to list unnecessarily',
+    'Use range directly in most cases'
+)
+UNUSED_IMPORT_RULE = rule_info(
+    'unused_import', 'unused_import',
+    "Import '{detail}' appears to be unused",
+    'Remove unused imports to reduce memory footprint'
+)
 
 class CodeAnalyzer:
     """Analyzes Python code for sustainability and efficiency patterns"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[AnalysisCache] = None):
         self.issues = []
+        self.cache = cache
     
-    def analyze(self, code: str) -> Dict[str, Any]:
+    def analyze(self, code: Union[str, ParsedSource]) -> Dict[str, Any]:
         """Main analysis method that returns comprehensive code analysis"""
         self.issues = []
         
-        try:
-            tree = ast.parse(code)
-        except SyntaxError as e:
-            raise SyntaxError(f"Invalid Python syntax: {e}")
+        source = ParsedSource.ensure(code)
+        
+        # Oversized input is rejected outright, before it is hashed or parsed
+        source.check_limits()
+        
+        cache_key = None
+        if self.cache is not None:
+            cache_key = AnalysisCache.make_key('analyzer', RULESET_VERSION, source.content_hash)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                if source.profiler is not None:
+                    cached['timings'] = source.profiler.as_dict()
+                return cached
+        
+        if not source.is_valid:
+            raise SyntaxError(f"Invalid Python syntax: {source.syntax_error}")
         
         # Basic statistics
-        lines_of_code = len([line for line in code.split('\n') if line.strip() and not line.strip().startswith('#')])
+        lines_of_code = self._count_lines_of_code(source.lines)
         
-        # AST-based analysis
-        visitor = CodeVisitor()
-        visitor.visit(tree)
+        # AST-based analysis (single traversal shared with the security checker)
+        context = run_rules(source)
         
         # Additional pattern analysis
-        inefficient_patterns = self._find_inefficient_patterns(code)
-        unused_imports = self._find_unused_imports(code, tree)
+        profiler = source.profiler
+        if profiler is not None:
+            with profiler.stage('analyzer.inefficient_patterns'):
+                inefficient_patterns = self._find_inefficient_patterns(source.lines, source)
+            profiler.count('analyzer.inefficient_patterns', 'lines_scanned', len(source.lines))
+            with profiler.stage('analyzer.unused_imports'):
+                unused_imports = self._find_unused_imports(context.imports)
+        else:
+            inefficient_patterns = self._find_inefficient_patterns(source.lines, source)
+            unused_imports = self._find_unused_imports(context.imports)
         
         # Compile results
-        results = {
+        results = self.build_results(lines_of_code, context.stats, context.nested_depth,
+                                     context.issues['efficiency'], inefficient_patterns, unused_imports)
+        
+        if source.partial_reason is not None:
+            # A stage stopped early; never cache an incomplete result
+            results['partial'] = True
+            results['partial_reason'] = source.partial_reason
+        elif cache_key is not None:
+            self.cache.set(cache_key, results)
+        
+        if profiler is not None:
+            results['timings'] = profiler.as_dict()
+        
+        return results
+    
+    def build_results(self, lines_of_code: int, stats: Dict[str, int], nested_depth: int,
+                      rule_issues: List[Dict[str, Any]], inefficient_patterns: List[Dict[str, Any]],
+                      unused_imports: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Assemble the analysis results dictionary from collected statistics and issues"""
+        return {
             'lines_of_code': lines_of_code,
-            'function_count': visitor.function_count,
-            'import_count': visitor.import_count,
-            'while_loop_count': visitor.while_loop_count,
-            'for_loop_count': visitor.for_loop_count,
+            'function_count': stats.get('function_count', 0),
+            'import_count': stats.get('import_count', 0),
+            'while_loop_count': stats.get('while_loop_count', 0),
+            'for_loop_count': stats.get('for_loop_count', 0),
             'inefficient_patterns_count': len(inefficient_patterns),
             'unused_imports_count': len(unused_imports),
-            'issues': self._compile_issues(visitor, inefficient_patterns, unused_imports),
-            'complexity_score': self._calculate_complexity(visitor)
+            'issues': self._compile_issues(rule_issues, inefficient_patterns, unused_imports),
+            'complexity_score': self._calculate_complexity(stats, nested_depth)
         }
-        
-        return results
     
-    def _find_inefficient_patterns(self, code: str) -> List[Dict[str, Any]]:
-        """Find inefficient coding patterns using regex"""
+    def _count_lines_of_code(self, lines: List[str]) -> int:
+        """Count lines that are neither blank nor comments"""
+        return len([line for line in lines if line.strip() and not line.strip().startswith('#')])
+    
+    def _find_inefficient_patterns(self, lines: List[str], source: Optional[ParsedSource] = None) -> List[Issue]:
+        """Find inefficient coding patterns using regex, stopping early if source's time budget runs out"""
         patterns = []
-        lines = code.split('\n')
         
         for i, line in enumerate(lines, 1):
+            if source is not None and not i & 1023 and source.budget_exhausted():
+                break
+            
             # Check for range(len(...)) pattern
             if re.search(r'range\s*\(\s*len\s*\(', line):
-                patterns.append({
-                    'type': 'inefficient_range_len',
-                    'line': i,
-                    'description': 'Using range(len(...)) instead of direct iteration',
-                    'suggestion': 'Consider using "for item in collection:" or enumerate()'
-                })
+                patterns.append(Issue(RANGE_LEN_RULE, i))
             
             # Check for unnecessary list() calls
             if re.search(r'list\s*\(\s*range\s*\(', line):
-                patterns.append({
-                    'type': 'unnecessary_list_conversion',
-                    'line': i,
-                    'description': 'Converting range to list unnecessarily',
-                    'suggestion': 'Use range directly in most cases'
-                })
+                patterns.append(Issue(LIST_RANGE_RULE, i))
         
         return patterns
     
-    def _find_unused_imports(self, code: str, tree: ast.AST) -> List[Dict[str, Any]]:
-        """Find potentially unused imports"""
-        # Get all imports
-        imports = []
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    imports.append({
-                        'name': alias.name,
-                        'alias': alias.asname,
-                        'line': node.lineno,
-                        'type': 'import'
-                    })
-            elif isinstance(node, ast.ImportFrom):
-                for alias in node.names:
-                    imports.append({
-                        'name': alias.name,
-                        'alias': alias.asname,
-                        'module': node.module,
-                        'line': node.lineno,
-                        'type': 'from_import'
-                    })
-        
-        # Simple unused import detection (basic implementation)
+    def _find_unused_imports(self, imports: List[Dict[str, Any]]) -> List[Issue]:
+        """Find imports whose bound name is never read in their scope"""
         unused = []
-        code_body = ' '.join(code.split('\n')[1:])  # Skip import lines for usage check
         
         for imp in imports:
-            import_name = imp['alias'] if imp['alias'] else imp['name']
-            if import_name and import_name not in code_body:
-                unused.append({
-                    'type': 'unused_import',
-                    'line': imp['line'],
-                    'description': f"Import '{import_name}' appears to be unused",
-                    'suggestion': 'Remove unused imports to reduce memory footprint'
-                })
+            if imp['name'] == '*':
+                continue  # Star imports cannot be checked statically
+            
+            scope = imp['scope']
+            if scope is not None and imp['bound_name'] not in scope.loads:
+                import_name = imp['alias'] if imp['alias'] else imp['name']
+                unused.append(Issue(UNUSED_IMPORT_RULE, imp['line'], detail=import_name))
         
         return unused
     
-    def _compile_issues(self, visitor, inefficient_patterns, unused_imports) -> List[Dict[str, Any]]:
+    def _compile_issues(self, rule_issues, inefficient_patterns, unused_imports) -> List[Dict[str, Any]]:
         """Compile all issues into a single list"""
-        issues = []
-        
-        # Add while loop issues
-        for line in visitor.while_loops:
-            issues.append({
-                'type': 'while_loop',
-                'line': line,
-                'description': 'While loop detected - consider if for-loop or list comprehension is more appropriate',
-                'suggestion': 'Replace with for-loop or list comprehension when possible'
-            })
+        # Add AST rule issues (while loops, ...)
+        issues = list(rule_issues)
         
         # Add inefficient patterns
         issues.extend(inefficient_patterns)
@@ -129,13 +149,13 @@ class CodeAnalyzer:
         
         return sorted(issues, key=lambda x: x['line'])
     
-    def _calculate_complexity(self, visitor) -> int:
+    def _calculate_complexity(self, stats: Dict[str, int], nested_depth: int) -> int:
         """Calculate a simple complexity score"""
         complexity = 0
-        complexity += visitor.while_loop_count * 3  # While loops are more complex
-        complexity += visitor.for_loop_count * 1
-        complexity += visitor.function_count * 2
-        complexity += visitor.nested_depth * 2
+        complexity += stats.get('while_loop_count', 0) * 3  # While loops are more complex
+        complexity += stats.get('for_loop_count', 0) * 1
+        complexity += stats.get('function_count', 0) * 2
+        complexity += nested_depth * 2
         return complexity
     
     def calculate_green_score(self, analysis_results: Dict[str, Any]) -> int:
@@ -156,52 +176,3 @@ class CodeAnalyzer:
         # Calculate final score
         green_score = max(0, base_score - deductions)
         return min(100, green_score)
-
-class CodeVisitor(ast.NodeVisitor):
-    """AST visitor to collect code statistics"""
-    
-    def __init__(self):
-        self.function_count = 0
-        self.import_count = 0
-        self.while_loop_count = 0
-        self.for_loop_count = 0
-        self.while_loops = []  # Store line numbers
-        self.nested_depth = 0
-        self.current_depth = 0
-    
-    def visit_FunctionDef(self, node):
-        self.function_count += 1
-        self.current_depth += 1
-        self.nested_depth = max(self.nested_depth, self.current_depth)
-        self.generic_visit(node)
-        self.current_depth -= 1
-    
-    def visit_AsyncFunctionDef(self, node):
-        self.function_count += 1
-        self.current_depth += 1
-        self.nested_depth = max(self.nested_depth, self.current_depth)
-        self.generic_visit(node)
-        self.current_depth -= 1
-    
-    def visit_Import(self, node):
-        self.import_count += len(node.names)
-        self.generic_visit(node)
-    
-    def visit_ImportFrom(self, node):
-        self.import_count += len(node.names)
-        self.generic_visit(node)
-    
-    def visit_While(self, node):
-        self.while_loop_count += 1
-        self.while_loops.append(node.lineno)
-        self.current_depth += 1
-        self.nested_depth = max(self.nested_depth, self.current_depth)
-        self.generic_visit(node)
-        self.current_depth -= 1
-    
-    def visit_For(self, node):
-        self.for_loop_count += 1
-        self.current_depth += 1
-        self.nested_depth = max(self.nested_depth, self.current_depth)
-        self.generic_visit(node)
-        self.current_depth -= 1
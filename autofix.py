@@ -0,0 +1,130 @@
+import ast
+import difflib
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Set
+from batch_scanner import DEFAULT_CHUNK_BYTES, discover_python_files, make_balanced_chunks
+from parsed_source import ParsedSource
+from refactor_transforms import REQUIRED_BUILTINS, apply_refactors
+
+def _definitions(tree: ast.AST) -> Dict[str, str]:
+    """Qualified name -> dump of the signature, decorators and bases of every function and class"""
+    definitions = {}
+    stack = [(tree, '')]
+    while stack:
+        node, prefix = stack.pop()
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                name = f"{prefix}{child.name}"
+                if isinstance(child, ast.ClassDef):
+                    parts = child.bases + child.keywords
+                else:
+                    parts = [child.args] + ([child.returns] if child.returns else [])
+                definitions[name] = '|'.join([type(child).__name__] +
+                                             [ast.dump(part) for part in parts + child.decorator_list])
+                stack.append((child, name + '.'))
+            else:
+                stack.append((child, prefix))
+    return definitions
+
+def _free_names(tree: ast.AST) -> Set[str]:
+    """Names read somewhere in the module but never bound in it, i.e. globals and builtins it depends on"""
+    loaded, bound = set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            (loaded if isinstance(node.ctx, ast.Load) else bound).add(node.id)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+    return loaded - bound
+
+def _guarded_spans(tree: ast.AST) -> List[tuple]:
+    """(first, last) body lines of every try and with statement, where handlers can see partial state"""
+    return [(node.lineno + 1, node.end_lineno) for node in ast.walk(tree)
+            if isinstance(node, (ast.Try, ast.TryStar, ast.With, ast.AsyncWith))]
+
+def check_semantics(original: ast.AST, rewritten: ast.AST, applied: List[Dict[str, Any]] = ()) -> Optional[str]:
+    """Return why a rewrite may have changed behavior, or None if the checks pass
+
+    These are conservative structural checks, not a proof of equivalence. The
+    rewrites only restructure loops, so every function and class must keep its
+    signature, decorators and bases, and the module must not start depending on
+    any new global name other than the builtins the rewrites use. No applied
+    rewrite may sit inside a try or with block, where an exception raised part
+    way through a loop is observable.
+    """
+    spans = _guarded_spans(original)
+    for record in applied:
+        if any(first <= record['line'] <= last for first, last in spans):
+            return f"rewrites a loop inside a try or with block (line {record['line']})"
+    if _definitions(original) != _definitions(rewritten):
+        return 'function or class definitions changed'
+    new_dependencies = _free_names(rewritten) - _free_names(original) - set(REQUIRED_BUILTINS)
+    if new_dependencies:
+        return f"introduces new global names: {', '.join(sorted(new_dependencies))}"
+    return None
+
+def unified_diff(old: str, new: str, path: str) -> str:
+    """Unified diff with a/ and b/ prefixes, applicable with git apply or patch -p1"""
+    lines = []
+    for line in difflib.unified_diff(old.splitlines(keepends=True), new.splitlines(keepends=True),
+                                     f"a/{path}", f"b/{path}"):
+        if not line.endswith('\n'):
+            line += '\n\\ No newline at end of file\n'
+        lines.append(line)
+    return ''.join(lines)
+
+def fix_source(code: str, path: str) -> Dict[str, Any]:
+    """Refactor one file's source, returning its patch or the reason it was skipped"""
+    source = ParsedSource(code)
+    if not source.is_valid:
+        return {'path': path, 'status': 'skipped', 'reason': f"Invalid Python syntax: {source.syntax_error}"}
+
+    result = apply_refactors(source)
+    if not result['changed']:
+        return {'path': path, 'status': 'unchanged'}
+
+    try:
+        rewritten = ast.parse(result['code'])
+        compile(rewritten, path, 'exec')
+    except (SyntaxError, ValueError) as e:
+        return {'path': path, 'status': 'skipped', 'reason': f"rewrite does not compile: {e}"}
+
+    reason = check_semantics(source.tree, rewritten, result['applied'])
+    if reason is not None:
+        return {'path': path, 'status': 'skipped', 'reason': reason}
+
+    return {
+        'path': path,
+        'status': 'fixed',
+        'applied': result['applied'],
+        'diff': unified_diff(code, result['code'], path)
+    }
+
+def fix_file(path: str, root: str) -> Dict[str, Any]:
+    relative_path = os.path.relpath(path, root).replace(os.sep, '/')
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            code = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return {'path': relative_path, 'status': 'error', 'reason': f"Could not read file: {e}"}
+
+    try:
+        return fix_source(code, relative_path)
+    except (RecursionError, ValueError) as e:
+        return {'path': relative_path, 'status': 'error', 'reason': str(e)}
+
+def fix_chunk(paths: List[str], root: str) -> List[Dict[str, Any]]:
+    """Worker entry point: refactor every file in a chunk"""
+    return [fix_file(path, root) for path in paths]
+
+def autofix_directory(root: str, workers: Optional[int] = None,
+                      chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Iterator[Dict[str, Any]]:
+    """Refactor every Python file under root across a process pool, yielding results as they finish"""
+    chunks = make_balanced_chunks(discover_python_files(root), chunk_bytes)
+    if not chunks:
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(fix_chunk, chunk, root) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
@@ -0,0 +1,171 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from analyzer import CodeAnalyzer
+from security_checker import SecurityChecker
+from carbon_calculator import CarbonCalculator
+from parsed_source import ParsedSource
+from analysis_cache import AnalysisCache
+from rules import RULESET_VERSION
+from instrumentation import Profiler, timed_stage
+
+# Directories that never contain first-party source worth scanning
+SKIPPED_DIRECTORIES = {'__pycache__', 'node_modules', 'venv', 'site-packages'}
+
+# Target amount of source per worker task, so tiny files are batched and huge files run alone
+DEFAULT_CHUNK_BYTES = 512 * 1024
+
+# Per-process analysis components and result cache, created lazily inside each worker
+_worker_components = None
+_worker_cache: Optional[AnalysisCache] = None
+_worker_profile = False
+
+def discover_python_files(root: str) -> List[Tuple[str, int]]:
+    """Find all .py files under root, returning (path, size in bytes) pairs"""
+    files = []
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.') and d not in SKIPPED_DIRECTORIES]
+
+        for filename in filenames:
+            if filename.endswith('.py'):
+                path = os.path.join(dirpath, filename)
+                try:
+                    files.append((path, os.path.getsize(path)))
+                except OSError:
+                    continue
+
+    return files
+
+def make_balanced_chunks(files: List[Tuple[str, int]],
+                         chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> List[List[str]]:
+    """Group files into chunks of roughly chunk_bytes, largest files first"""
+    chunks = []
+    current = []
+    current_size = 0
+
+    for path, size in sorted(files, key=lambda f: f[1], reverse=True):
+        if current and current_size + size > chunk_bytes:
+            chunks.append(current)
+            current = []
+            current_size = 0
+        current.append(path)
+        current_size += size
+
+    if current:
+        chunks.append(current)
+
+    return chunks
+
+def _get_worker_components() -> Tuple[CodeAnalyzer, SecurityChecker, CarbonCalculator]:
+    global _worker_components
+    if _worker_components is None:
+        _worker_components = (CodeAnalyzer(), SecurityChecker(), CarbonCalculator())
+    return _worker_components
+
+def _init_worker(cache_dir: Optional[str], profile: bool = False):
+    global _worker_cache, _worker_profile
+    _worker_cache = AnalysisCache(cache_dir=cache_dir) if cache_dir else None
+    _worker_profile = profile
+
+def analyze_source(code: str, path: str = '') -> Dict[str, Any]:
+    """Run the full analysis pipeline on one source text, reusing cached results for unchanged content"""
+    analyzer, security_checker, carbon_calc = _get_worker_components()
+    profiler = Profiler() if _worker_profile else None
+    source = ParsedSource(code, profiler=profiler)
+    source.check_limits()
+
+    cache_key = None
+    if _worker_cache is not None:
+        calculator_parameters = json.dumps(carbon_calc.get_model_parameters(), sort_keys=True)
+        # The record's fields are part of the key, so records cached before a field was added miss
+        cache_key = AnalysisCache.make_key('scan', RULESET_VERSION, calculator_parameters,
+                                           RECORD_COUNT_STATS, source.content_hash)
+        cached = _worker_cache.get(cache_key)
+        if cached is not None:
+            cached['path'] = path
+            return cached
+
+    result = _run_pipeline(source, analyzer, security_checker, carbon_calc)
+
+    if cache_key is not None and not result.get('partial'):
+        _worker_cache.set(cache_key, result)
+
+    result['path'] = path
+    if profiler is not None:
+        result['timings'] = profiler.as_dict()
+    return result
+
+def _run_pipeline(source: ParsedSource, analyzer: CodeAnalyzer, security_checker: SecurityChecker,
+                  carbon_calc: CarbonCalculator) -> Dict[str, Any]:
+    if not source.is_valid:
+        return {'error': f"Invalid Python syntax: {source.syntax_error}"}
+
+    analysis_results = analyzer.analyze(source)
+    security_analysis = security_checker.analyze_security(source)
+    return build_record(analyzer, analysis_results, security_analysis, carbon_calc, source.profiler)
+
+# Analyzer count stats copied into every record, matching the analyses table's columns
+RECORD_COUNT_STATS = ('function_count', 'import_count', 'while_loop_count', 'for_loop_count')
+
+def build_record(analyzer: CodeAnalyzer, analysis_results: Dict[str, Any],
+                 security_analysis: Dict[str, Any], carbon_calc: CarbonCalculator,
+                 profiler: Optional[Profiler] = None) -> Dict[str, Any]:
+    """Flatten analysis, security and carbon results into one per-file record"""
+    with timed_stage(profiler, 'carbon'):
+        energy_data = carbon_calc.calculate_energy_consumption(analysis_results)
+        carbon_data = carbon_calc.calculate_carbon_footprint(energy_data)
+
+    with timed_stage(profiler, 'scoring'):
+        green_score = analyzer.calculate_green_score(analysis_results)
+
+    record = {
+        'green_score': green_score,
+        'lines_of_code': analysis_results['lines_of_code'],
+        'complexity_score': analysis_results['complexity_score'],
+        # Count stats are kept so a record can be saved as an analysis (scan --save-as)
+        **{name: analysis_results[name] for name in RECORD_COUNT_STATS},
+        'issues': analysis_results['issues'],
+        'security_score': security_analysis['security_score'],
+        'risk_level': security_analysis['risk_level'],
+        'security_issues': security_analysis['security_issues'],
+        'energy_consumption': energy_data['total_energy_uj'],
+        'carbon_emissions': carbon_data['carbon_emissions_g']
+    }
+    partial_reason = analysis_results.get('partial_reason') or security_analysis.get('partial_reason')
+    if partial_reason:
+        record['partial'] = True
+        record['partial_reason'] = partial_reason
+    return record
+
+def analyze_file(path: str) -> Dict[str, Any]:
+    """Analyze a single file, reporting read and syntax errors in the result"""
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            code = f.read()
+    except OSError as e:
+        return {'path': path, 'error': f"Could not read file: {e}"}
+
+    try:
+        return analyze_source(code, path)
+    except (SyntaxError, ValueError, RecursionError) as e:
+        return {'path': path, 'error': str(e)}
+
+def analyze_chunk(paths: List[str]) -> List[Dict[str, Any]]:
+    """Worker entry point: analyze every file in a chunk"""
+    return [analyze_file(path) for path in paths]
+
+def scan_directory(root: str, workers: Optional[int] = None,
+                   chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                   cache_dir: Optional[str] = None, profile: bool = False) -> Iterator[Dict[str, Any]]:
+    """Analyze every Python file under root across a process pool, yielding results as they finish"""
+    chunks = make_balanced_chunks(discover_python_files(root), chunk_bytes)
+    if not chunks:
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cache_dir, profile)) as executor:
+        futures = [executor.submit(analyze_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
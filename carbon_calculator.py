@@ -1,10 +1,14 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import math
+from execution_profiler import CpuPowerModel
 
 class CarbonCalculator:
     """Calculates estimated carbon footprint and energy consumption of code"""
     
-    def __init__(self):
+    def __init__(self, power_model: Optional[CpuPowerModel] = None):
+        # Power model used to convert measured execution (measure mode) into energy
+        self.power_model = power_model or CpuPowerModel()
+        
         # Energy consumption estimates (in micro-joules per operation)
         self.energy_costs = {
             'function_call': 0.5,
@@ -23,6 +27,14 @@ class CarbonCalculator:
         # Conversion factor: micro-joules to kWh
         self.uj_to_kwh = 2.78e-13
     
+    def get_model_parameters(self) -> Dict[str, Any]:
+        """Get the parameters the energy and carbon estimates depend on"""
+        return {
+            'energy_costs': self.energy_costs,
+            'carbon_factor': self.carbon_factor,
+            'uj_to_kwh': self.uj_to_kwh
+        }
+    
     def calculate_energy_consumption(self, analysis_results: Dict[str, Any]) -> Dict[str, Any]:
         """Calculate estimated energy consumption based on code analysis"""
         
@@ -67,6 +79,31 @@ class CarbonCalculator:
             }
         }
     
+    def calculate_measured_energy(self, measurement: Dict[str, Any]) -> Dict[str, Any]:
+        """Calculate energy consumption per run from an ExecutionProfiler measurement
+        
+        Returns the same shape as calculate_energy_consumption, so the result can be
+        passed to calculate_carbon_footprint.
+        """
+        repeat = measurement.get('repeat', 1)
+        energy = self.power_model.energy_joules(measurement)
+        cpu_energy = energy['cpu_joules'] * 1e6 / repeat
+        memory_energy = energy['memory_joules'] * 1e6 / repeat
+        
+        return {
+            'total_energy_uj': cpu_energy + memory_energy,
+            'measured': True,
+            'cpu_energy': cpu_energy,
+            'memory_energy': memory_energy,
+            'cpu_seconds': measurement['cpu_s'] / repeat,
+            'wall_seconds': measurement['wall_s'] / repeat,
+            'peak_rss_bytes': measurement.get('peak_rss_bytes'),
+            'energy_breakdown': {
+                'CPU': cpu_energy,
+                'Memory': memory_energy
+            }
+        }
+    
     def calculate_carbon_footprint(self, energy_consumption: Dict[str, Any]) -> Dict[str, Any]:
         """Calculate carbon footprint from energy consumption"""
         
@@ -1,12 +1,26 @@
 import os
+import base64
+import binascii
 import json
+import threading
+import time
+from collections import defaultdict
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Any, Optional
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, Text, JSON, Boolean
+from typing import List, Dict, Any, Iterable, Optional
+from sqlalchemy import (create_engine, Column, Integer, BigInteger, String, DateTime, Float, Text, JSON, Boolean,
+                        Index, and_, bindparam, case, cast, event, exists, func, insert, inspect, literal, or_, select,
+                        text, tuple_, update)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
 import logging
+from issues import to_jsonable
+from instrumentation import TimingHistograms
+from query_cache import QueryCache
+from retention import open_archive
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -14,6 +28,132 @@ logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
+# (level, minimum analyses, minimum average score), checked from the highest level down
+LEVEL_THRESHOLDS = [
+    (6, 25, 90),  # Green Code Hero
+    (5, 15, 85),  # Sustainability Master
+    (4, 10, 75),  # Green Champion
+    (3, 5, 60),   # Eco Developer
+    (2, 3, 40),   # Code Gardener
+]
+
+def calculate_level(total_analyses: int, average_score: float) -> int:
+    """Level earned for a number of analyses and an average score"""
+    for level, min_analyses, min_average in LEVEL_THRESHOLDS:
+        if total_analyses >= min_analyses and average_score >= min_average:
+            return level
+    return 1
+
+# Leaderboard ranking weights: consistency (average) matters more than a single best run
+COMPOSITE_AVERAGE_WEIGHT = 0.7
+COMPOSITE_BEST_WEIGHT = 0.3
+
+def composite_score(average_score, best_score):
+    """Leaderboard ranking score; works on numbers and on SQL column expressions"""
+    return average_score * COMPOSITE_AVERAGE_WEIGHT + best_score * COMPOSITE_BEST_WEIGHT
+
+def _level_expression(total_analyses, average_score):
+    """calculate_level as a SQL expression"""
+    return case(*[(and_(total_analyses >= min_analyses, average_score >= min_average), level)
+                  for level, min_analyses, min_average in LEVEL_THRESHOLDS], else_=1)
+
+def _score_totals(scores: List[int]) -> Dict[str, int]:
+    """Count, sum, sum of squares and maximum of a group of new scores"""
+    return {
+        'count': len(scores),
+        'score_sum': sum(scores),
+        'score_sq_sum': sum(score * score for score in scores),
+        'best_score': max(scores)
+    }
+
+def _stat_increments(model, totals: Dict[str, int]) -> Dict[str, Any]:
+    """SET clauses that fold a group of new scores into a row's running aggregates
+    
+    Every right-hand side reads the row's old values, so the update is a single
+    atomic statement no matter how many analyses the user already has.
+    """
+    total_analyses = model.total_analyses + totals['count']
+    score_sum = model.score_sum + totals['score_sum']
+    average_score = cast(score_sum, Float) / total_analyses
+    best_score = totals['best_score']
+    return {
+        'total_analyses': total_analyses,
+        'score_sum': score_sum,
+        'score_sq_sum': model.score_sq_sum + totals['score_sq_sum'],
+        'best_score': case((or_(model.total_analyses == 0, model.best_score < best_score), best_score),
+                           else_=model.best_score),
+        'average_score': average_score,
+        'current_level': _level_expression(total_analyses, average_score)
+    }
+
+def _initial_stats(totals: Dict[str, int]) -> Dict[str, Any]:
+    """Running aggregates of a row whose first scores are summarized by totals"""
+    average_score = totals['score_sum'] / totals['count']
+    return {
+        'total_analyses': totals['count'],
+        'score_sum': totals['score_sum'],
+        'score_sq_sum': totals['score_sq_sum'],
+        'best_score': totals['best_score'],
+        'average_score': average_score,
+        'current_level': calculate_level(totals['count'], average_score)
+    }
+
+def _analysis_values(username: str, green_score: int, analysis_results: Dict[str, Any],
+                     security_score: int = 100, energy_consumption: float = 0.0,
+                     carbon_emissions: float = 0.0, code_snippet: str = "") -> Dict[str, Any]:
+    """Column values of the analyses row for one saved analysis"""
+    return {
+        'username': username,
+        'green_score': green_score,
+        'lines_of_code': analysis_results.get('lines_of_code', 0),
+        'function_count': analysis_results.get('function_count', 0),
+        'import_count': analysis_results.get('import_count', 0),
+        'while_loop_count': analysis_results.get('while_loop_count', 0),
+        'for_loop_count': analysis_results.get('for_loop_count', 0),
+        'issues_count': len(analysis_results.get('issues', [])),
+        'complexity_score': analysis_results.get('complexity_score', 0),
+        'security_score': security_score,
+        'energy_consumption': energy_consumption,
+        'carbon_emissions': carbon_emissions,
+        'code_preview': code_snippet[:500],  # Limit preview length
+        'analysis_data': analysis_results
+    }
+
+# Records per multi-row insert and transaction in save_analyses_bulk
+BULK_CHUNK_SIZE = 1000
+
+# Dialects with INSERT ... ON CONFLICT support; others fall back to update-then-insert
+_UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert
+}
+
+# Columns the leaderboard copies from the users table
+_LEADERBOARD_STAT_COLUMNS = ['best_score', 'average_score', 'total_analyses', 'current_level',
+                             'score_sum', 'score_sq_sum']
+
+def _lifetime_stats(user, total_analyses: int, best_score: int, score_sum: int,
+                    score_sq_sum: int) -> Dict[str, Any]:
+    """User aggregates from totals over live analyses plus the user's deleted_* totals"""
+    total_analyses += user.deleted_count
+    score_sum += user.deleted_score_sum
+    average_score = score_sum / total_analyses if total_analyses else 0.0
+    return {
+        'total_analyses': total_analyses,
+        'best_score': max(best_score, user.deleted_best_score),
+        'average_score': average_score,
+        'current_level': calculate_level(total_analyses, average_score),
+        'score_sum': score_sum,
+        'score_sq_sum': score_sq_sum + user.deleted_score_sq_sum
+    }
+
+def _score_stddev(total_analyses: int, score_sum: float, score_sq_sum: float) -> float:
+    """Population standard deviation of the scores from the running sums"""
+    if not total_analyses:
+        return 0.0
+    mean = score_sum / total_analyses
+    return max(score_sq_sum / total_analyses - mean * mean, 0.0) ** 0.5
+
 class User(Base):
     __tablename__ = 'users'
     
@@ -25,6 +165,14 @@ class User(Base):
     best_score = Column(Integer, default=0)
     average_score = Column(Float, default=0.0)
     current_level = Column(Integer, default=1)
+    # Running aggregates so stats are updated per save without rereading the history
+    score_sum = Column(BigInteger, default=0, server_default='0', nullable=False)
+    score_sq_sum = Column(BigInteger, default=0, server_default='0', nullable=False)
+    # Totals of the analyses removed by cleanup_old_data, which the aggregates still include
+    deleted_count = Column(Integer, default=0, server_default='0', nullable=False)
+    deleted_score_sum = Column(BigInteger, default=0, server_default='0', nullable=False)
+    deleted_score_sq_sum = Column(BigInteger, default=0, server_default='0', nullable=False)
+    deleted_best_score = Column(Integer, default=0, server_default='0', nullable=False)
 
 class Analysis(Base):
     __tablename__ = 'analyses'
@@ -45,6 +193,29 @@ class Analysis(Base):
     code_preview = Column(Text, nullable=True)
     analysis_data = Column(JSON, nullable=True)  # Store full analysis results
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (
+        # Serves per-user history pages in (created_at, id) order straight from the index
+        Index('ix_analyses_username_created_at', 'username', 'created_at', 'id'),
+    )
+
+# Columns returned by history queries; analysis_data is left out so its JSON is never loaded
+_HISTORY_COLUMNS = [Analysis.id, Analysis.created_at, Analysis.green_score, Analysis.lines_of_code,
+                    Analysis.function_count, Analysis.issues_count, Analysis.complexity_score,
+                    Analysis.security_score, Analysis.energy_consumption, Analysis.carbon_emissions,
+                    Analysis.code_preview]
+
+def _encode_cursor(created_at: datetime, analysis_id: int) -> str:
+    """Opaque cursor pointing just after an analysis in newest-first order"""
+    payload = json.dumps([created_at.isoformat(), analysis_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, analysis_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(analysis_id)
+    except (binascii.Error, UnicodeError, TypeError, ValueError):
+        raise ValueError("Invalid history cursor")
 
 class Achievement(Base):
     __tablename__ = 'achievements'
@@ -65,33 +236,262 @@ class Leaderboard(Base):
     average_score = Column(Float, default=0.0)
     total_analyses = Column(Integer, default=0)
     current_level = Column(Integer, default=1)
+    score_sum = Column(BigInteger, default=0, server_default='0', nullable=False)
+    score_sq_sum = Column(BigInteger, default=0, server_default='0', nullable=False)
+    # composite_score(average_score, best_score), stored so ranking can use an index
+    composite_score = Column(Float, default=0.0, server_default='0', nullable=False)
     total_carbon_saved = Column(Float, default=0.0)
     last_updated = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Ranking order, so top-N and rank lookups walk the index instead of sorting
+        Index('ix_leaderboard_ranking', composite_score.desc(), 'username'),
+    )
+
+# Leaderboard order, best first; username breaks ties so every user has one rank
+_RANKING = [Leaderboard.composite_score.desc(), Leaderboard.username.asc()]
+
+class AnalyticsSummary(Base):
+    """Platform-wide totals, recomputed periodically instead of on every read"""
+    __tablename__ = 'analytics_summary'
+    
+    id = Column(Integer, primary_key=True)  # Always 1: the table holds a single row
+    total_users = Column(Integer, default=0)
+    total_analyses = Column(BigInteger, default=0)
+    average_platform_score = Column(Float, default=0.0)
+    total_energy_saved = Column(Float, default=0.0)
+    total_carbon_saved = Column(Float, default=0.0)
+    refreshed_at = Column(DateTime, default=datetime.utcnow)
+
+class PoolMetrics:
+    """Checkout counters and checkout wait times for one engine's connection pool"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {'connects': 0, 'checkouts': 0, 'checkins': 0, 'timeouts': 0}
+        self.wait_times = TimingHistograms()
+    
+    def increment(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+    
+    def record_wait(self, seconds: float):
+        self.wait_times.record({'checkout_wait': {'wall_ms': seconds * 1000}})
+    
+    def as_dict(self, pool) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self.counters)
+        metrics['checkout_wait'] = self.wait_times.summary().get('checkout_wait', {})
+        if isinstance(pool, QueuePool):
+            metrics.update({
+                'pool_size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'idle': pool.checkedin(),
+                'overflow': pool.overflow()
+            })
+        return metrics
+
+class _MeteredQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection"""
+    
+    metrics: PoolMetrics = None
+    
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.metrics.increment('timeouts')
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - start)
+    
+    def recreate(self):
+        # engine.dispose() replaces the pool; keep accumulating into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+def _pool_options(database_url: str) -> Dict[str, Any]:
+    """create_engine pool arguments from the GREENCODE_DB_POOL_* variables"""
+    # SQLite uses per-thread or per-file pools that do not take QueuePool sizing
+    if make_url(database_url).get_backend_name() == 'sqlite':
+        return {}
+    return {
+        'poolclass': _MeteredQueuePool,
+        'pool_size': int(os.getenv('GREENCODE_DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('GREENCODE_DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': float(os.getenv('GREENCODE_DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('GREENCODE_DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': os.getenv('GREENCODE_DB_POOL_PRE_PING', '1') != '0'
+    }
+
+def _add_missing_columns(engine: Engine) -> set:
+    """ALTER existing tables to add model columns they predate; returns the (table, column) pairs added
+    
+    Only columns with a server default (or that are nullable) can be added to a
+    table that already holds rows; anything else needs a manual migration.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    quote = engine.dialect.identifier_preparer.quote
+    added = set()
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                if column.server_default is None and not column.nullable:
+                    raise RuntimeError(f"Cannot add column {table.name}.{column.name} to an existing table "
+                                       "without a server default")
+                ddl = f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} " \
+                      f"{column.type.compile(dialect=engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+                connection.execute(text(ddl))
+                added.add((table.name, column.name))
+                logger.info(f"Added column {table.name}.{column.name}")
+    return added
+
+def _backfill_user_stats(connection):
+    """Recompute every user's aggregates from the analyses table and copy them into the leaderboard
+    
+    Set-based, so it runs as a handful of statements whatever the number of users.
+    """
+    def per_user(expression):
+        return select(func.coalesce(expression, 0)).where(Analysis.username == User.username).scalar_subquery()
+    
+    score = Analysis.green_score
+    best_score = per_user(func.max(score))
+    connection.execute(update(User).values(
+        total_analyses=per_user(func.count(Analysis.id)) + User.deleted_count,
+        best_score=case((User.deleted_best_score > best_score, User.deleted_best_score), else_=best_score),
+        score_sum=per_user(func.sum(score)) + User.deleted_score_sum,
+        score_sq_sum=per_user(func.sum(score * score)) + User.deleted_score_sq_sum
+    ))
+    average = case((User.total_analyses > 0, cast(User.score_sum, Float) / User.total_analyses), else_=0.0)
+    connection.execute(update(User).values(average_score=average))
+    connection.execute(update(User).values(
+        current_level=_level_expression(User.total_analyses, User.average_score)
+    ))
+    
+    columns = _LEADERBOARD_STAT_COLUMNS + ['composite_score']
+    user_values = {column: getattr(User, column) for column in _LEADERBOARD_STAT_COLUMNS}
+    user_values['composite_score'] = composite_score(User.average_score, User.best_score)
+    connection.execute(update(Leaderboard).values(**{
+        column: select(value).where(User.username == Leaderboard.username).scalar_subquery()
+        for column, value in user_values.items()
+    }))
+    missing = ~exists().where(Leaderboard.username == User.username)
+    connection.execute(insert(Leaderboard).from_select(
+        ['username'] + columns + ['last_updated'],
+        select(User.username, *[user_values[column] for column in columns],
+               literal(datetime.utcnow(), DateTime)).where(User.total_analyses > 0, missing)
+    ))
+
+def create_tables(engine: Engine):
+    """Create all database tables, and migrate existing tables to the current models
+    
+    Columns added since a table was created are added with ALTER TABLE and
+    backfilled before the indexes that use them are created.
+    """
+    try:
+        Base.metadata.create_all(bind=engine, checkfirst=True)
+        added = _add_missing_columns(engine)
+        if ('users', 'score_sum') in added or ('users', 'score_sq_sum') in added:
+            with engine.begin() as connection:
+                _backfill_user_stats(connection)
+            logger.info("Backfilled user statistics from the analyses table")
+        elif ('leaderboard', 'composite_score') in added:
+            with engine.begin() as connection:
+                connection.execute(update(Leaderboard).values(
+                    composite_score=composite_score(Leaderboard.average_score, Leaderboard.best_score)
+                ))
+            logger.info("Backfilled leaderboard composite scores")
+        # create_all skips existing tables, so add indexes introduced since they were created
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
+        logger.info("Database tables created successfully")
+    except SQLAlchemyError as e:
+        logger.error(f"Error creating tables: {e}")
+        # Don't raise for duplicate constraint errors - tables already exist
+        if "duplicate key value violates unique constraint" not in str(e):
+            raise
+
+# One engine, and so one connection pool, per database URL for the whole process
+_engines: Dict[str, Engine] = {}
+_pool_metrics: Dict[str, PoolMetrics] = {}
+_query_caches: Dict[str, QueryCache] = {}
+# Held while the analytics summary is recomputed, so each process refreshes it at most once at a time
+_analytics_refresh_locks: Dict[str, threading.Lock] = {}
+_engines_lock = threading.Lock()
+
+def get_engine(database_url: str) -> Engine:
+    """The process-wide engine for database_url, created with its schema on first use"""
+    with _engines_lock:
+        engine = _engines.get(database_url)
+        if engine is not None:
+            return engine
+        
+        # Issue records are converted to plain dicts only when the JSON column is serialized
+        engine = create_engine(database_url, **_pool_options(database_url),
+                               json_serializer=lambda obj: json.dumps(obj, default=to_jsonable))
+        metrics = PoolMetrics()
+        if isinstance(engine.pool, _MeteredQueuePool):
+            engine.pool.metrics = metrics
+        for name, counter in (('connect', 'connects'), ('checkout', 'checkouts'), ('checkin', 'checkins')):
+            event.listen(engine, name, lambda *args, counter=counter: metrics.increment(counter))
+        
+        try:
+            create_tables(engine)
+        except Exception:
+            engine.dispose()
+            raise
+        _engines[database_url] = engine
+        _pool_metrics[database_url] = metrics
+        _query_caches[database_url] = QueryCache(
+            max_entries=int(os.getenv('GREENCODE_QUERY_CACHE_SIZE', '1024')),
+            ttl_seconds=float(os.getenv('GREENCODE_QUERY_CACHE_TTL', '30'))
+        )
+        _analytics_refresh_locks[database_url] = threading.Lock()
+        return engine
 
 class DatabaseManager:
-    """Manages database operations for Green Code Checker"""
+    """Manages database operations for Green Code Checker
+    
+    Instances are cheap: every manager for the same DATABASE_URL shares one
+    engine and connection pool, and the schema is created once per process.
+    User stats, history pages and the leaderboard are served through a shared
+    read cache that saves invalidate per username.
+    """
     
     def __init__(self):
         self.database_url = os.getenv('DATABASE_URL')
         if not self.database_url:
             raise ValueError("DATABASE_URL environment variable not set")
         
-        self.engine = create_engine(self.database_url)
+        self.engine = get_engine(self.database_url)
+        # Shared by every manager in the process so a save invalidates everyone's reads
+        self.query_cache = _query_caches[self.database_url]
+        self._analytics_refresh_lock = _analytics_refresh_locks[self.database_url]
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
         
-        # Create tables
-        self.create_tables()
+        # Seconds before the cached platform analytics are recomputed
+        self.analytics_max_age = float(os.getenv('GREENCODE_ANALYTICS_MAX_AGE', '300'))
     
     def create_tables(self):
         """Create all database tables"""
-        try:
-            Base.metadata.create_all(bind=self.engine, checkfirst=True)
-            logger.info("Database tables created successfully")
-        except SQLAlchemyError as e:
-            logger.error(f"Error creating tables: {e}")
-            # Don't raise for duplicate constraint errors - tables already exist
-            if "duplicate key value violates unique constraint" not in str(e):
-                raise
+        create_tables(self.engine)
+    
+    def get_pool_metrics(self) -> Dict[str, Any]:
+        """Connection counters, checkout wait percentiles and current pool usage"""
+        return _pool_metrics[self.database_url].as_dict(self.engine.pool)
     
     def get_session(self) -> Session:
         """Get database session"""
@@ -122,35 +522,21 @@ class DatabaseManager:
     def save_analysis(self, username: str, green_score: int, analysis_results: Dict[str, Any], 
                      security_score: int = 100, energy_consumption: float = 0.0, 
                      carbon_emissions: float = 0.0, code_snippet: str = "") -> bool:
-        """Save analysis results to database"""
+        """Save analysis results to database
+        
+        The analysis, the user's statistics and the leaderboard entry are written in
+        one transaction; the user and leaderboard rows are created on first use.
+        """
         try:
             with self.get_session() as session:
-                # Ensure user exists
-                self.add_user(username)
-                
-                # Create analysis record
-                analysis = Analysis(
-                    username=username,
-                    green_score=green_score,
-                    lines_of_code=analysis_results.get('lines_of_code', 0),
-                    function_count=analysis_results.get('function_count', 0),
-                    import_count=analysis_results.get('import_count', 0),
-                    while_loop_count=analysis_results.get('while_loop_count', 0),
-                    for_loop_count=analysis_results.get('for_loop_count', 0),
-                    issues_count=len(analysis_results.get('issues', [])),
-                    complexity_score=analysis_results.get('complexity_score', 0),
-                    security_score=security_score,
-                    energy_consumption=energy_consumption,
-                    carbon_emissions=carbon_emissions,
-                    code_preview=code_snippet[:500],  # Limit preview length
-                    analysis_data=analysis_results
-                )
-                
+                analysis = Analysis(**_analysis_values(
+                    username, green_score, analysis_results, security_score,
+                    energy_consumption, carbon_emissions, code_snippet
+                ))
                 session.add(analysis)
+                self._update_user_stats(session, username, _score_totals([green_score]))
                 session.commit()
-                
-                # Update user statistics
-                self._update_user_stats(session, username)
+                self._invalidate_cached_reads(username)
                 
                 logger.info(f"Analysis saved for user: {username}, score: {green_score}")
                 return True
@@ -159,174 +545,316 @@ class DatabaseManager:
             logger.error(f"Error saving analysis: {e}")
             return False
     
-    def _update_user_stats(self, session: Session, username: str):
-        """Update user statistics based on their analyses"""
-        try:
-            # Get user analyses
-            analyses = session.query(Analysis).filter(Analysis.username == username).all()
-            
-            if not analyses:
-                return
-            
-            total_analyses = len(analyses)
-            scores = [a.green_score for a in analyses]
-            best_score = max(scores)
-            average_score = sum(scores) / len(scores)
-            
-            # Calculate level based on performance
-            current_level = 1
-            if total_analyses >= 25 and average_score >= 90:
-                current_level = 6  # Green Code Hero
-            elif total_analyses >= 15 and average_score >= 85:
-                current_level = 5  # Sustainability Master
-            elif total_analyses >= 10 and average_score >= 75:
-                current_level = 4  # Green Champion
-            elif total_analyses >= 5 and average_score >= 60:
-                current_level = 3  # Eco Developer
-            elif total_analyses >= 3 and average_score >= 40:
-                current_level = 2  # Code Gardener
+    def save_analyses_bulk(self, records: Iterable[Dict[str, Any]],
+                           chunk_size: int = BULK_CHUNK_SIZE) -> List[Dict[str, Any]]:
+        """Save many analyses with multi-row inserts
+        
+        Each record holds save_analysis's arguments as keys: username and
+        green_score, and optionally analysis_results, security_score,
+        energy_consumption, carbon_emissions and code_snippet. Records are written
+        in chunks of chunk_size, one transaction per chunk, with one aggregate
+        update per user per chunk. Returns one {'index', 'status'} entry per record
+        in input order, where status is 'saved' or 'error' (with a 'reason'); a
+        chunk that fails is rolled back and all its records are reported as errors.
+        """
+        statuses = []
+        chunk = []
+        for index, record in enumerate(records):
+            try:
+                values = _analysis_values(**{'analysis_results': {}, **record})
+            except (TypeError, AttributeError) as e:
+                statuses.append({'index': index, 'status': 'error', 'reason': f"Invalid record: {e}"})
+                continue
+            if not isinstance(values['username'], str) or not values['username']:
+                statuses.append({'index': index, 'status': 'error', 'reason': "username must be a non-empty string"})
+                continue
+            if not isinstance(values['green_score'], int) or isinstance(values['green_score'], bool):
+                statuses.append({'index': index, 'status': 'error', 'reason': "green_score must be an integer"})
+                continue
             
-            # Update user record
-            user = session.query(User).filter(User.username == username).first()
-            if user:
-                user.total_analyses = total_analyses
-                user.best_score = best_score
-                user.average_score = average_score
-                user.current_level = current_level
+            chunk.append((index, values))
+            if len(chunk) >= chunk_size:
+                statuses.extend(self._save_chunk(chunk))
+                chunk = []
+        if chunk:
+            statuses.extend(self._save_chunk(chunk))
+        
+        statuses.sort(key=lambda status: status['index'])
+        return statuses
+    
+    def _save_chunk(self, chunk: List[tuple]) -> List[Dict[str, Any]]:
+        """Insert one chunk of (index, analysis values) and update each user's aggregates once"""
+        try:
+            with self.get_session() as session:
+                session.execute(insert(Analysis), [values for _, values in chunk])
+                
+                scores = defaultdict(list)
+                for _, values in chunk:
+                    scores[values['username']].append(values['green_score'])
+                # Sorted so concurrent batches lock user rows in the same order
+                for username in sorted(scores):
+                    self._update_user_stats(session, username, _score_totals(scores[username]))
                 
-                # Update leaderboard
-                self._update_leaderboard(session, username, best_score, average_score, 
-                                       total_analyses, current_level)
+                session.commit()
+                self._invalidate_cached_reads(*scores)
+                logger.info(f"Saved {len(chunk)} analyses for {len(scores)} users")
+                return [{'index': index, 'status': 'saved'} for index, _ in chunk]
                 
         except SQLAlchemyError as e:
-            logger.error(f"Error updating user stats: {e}")
+            logger.error(f"Error saving analyses: {e}")
+            return [{'index': index, 'status': 'error', 'reason': str(e)} for index, _ in chunk]
+    
+    def _invalidate_cached_reads(self, *usernames: str):
+        """Drop cached reads a save for these users may have changed"""
+        self.query_cache.invalidate('leaderboard', *[('user', username) for username in usernames])
+    
+    def _upsert_insert(self, session: Session):
+        """The dialect's ON CONFLICT-capable insert(), or None if it has none"""
+        return _UPSERT_INSERTS.get(session.get_bind().dialect.name)
+    
+    def _update_user_stats(self, session: Session, username: str, totals: Dict[str, int]):
+        """Fold new scores into the user's running aggregates, creating the user if needed"""
+        dialect_insert = self._upsert_insert(session)
+        if dialect_insert is not None:
+            session.execute(
+                dialect_insert(User).values(username=username, **_initial_stats(totals))
+                .on_conflict_do_update(index_elements=[User.username],
+                                       set_=_stat_increments(User, totals))
+            )
+        else:
+            updated = session.execute(
+                update(User).where(User.username == username).values(**_stat_increments(User, totals))
+            )
+            if updated.rowcount == 0:
+                session.add(User(username=username, **_initial_stats(totals)))
+                session.flush()
+        
+        self._sync_leaderboard(session, username)
+    
+    def _sync_leaderboard(self, session: Session, username: str):
+        """Copy the user's aggregates into their leaderboard entry, creating it if needed"""
+        dialect_insert = self._upsert_insert(session)
+        if dialect_insert is None:
+            user = session.query(User).filter(User.username == username).one()
+            self._update_leaderboard(session, username,
+                                     **{column: getattr(user, column) for column in _LEADERBOARD_STAT_COLUMNS})
+            return
+        
+        # INSERT ... SELECT from users, so the copy is one statement and concurrent
+        # saves cannot create duplicate leaderboard rows
+        columns = ['username'] + _LEADERBOARD_STAT_COLUMNS
+        statement = dialect_insert(Leaderboard).from_select(
+            columns + ['composite_score', 'last_updated'],
+            select(*[getattr(User, column) for column in columns],
+                   composite_score(User.average_score, User.best_score),
+                   literal(datetime.utcnow(), DateTime)).where(User.username == username)
+        )
+        updated_columns = _LEADERBOARD_STAT_COLUMNS + ['composite_score', 'last_updated']
+        session.execute(statement.on_conflict_do_update(
+            index_elements=[Leaderboard.username],
+            set_={column: statement.excluded[column] for column in updated_columns}
+        ))
     
     def _update_leaderboard(self, session: Session, username: str, best_score: int, 
-                          average_score: float, total_analyses: int, current_level: int):
-        """Update leaderboard entry for user"""
-        try:
-            leaderboard_entry = session.query(Leaderboard).filter(
-                Leaderboard.username == username
-            ).first()
-            
-            if not leaderboard_entry:
-                leaderboard_entry = Leaderboard(username=username)
-                session.add(leaderboard_entry)
-            
-            leaderboard_entry.best_score = best_score
-            leaderboard_entry.average_score = average_score
-            leaderboard_entry.total_analyses = total_analyses
-            leaderboard_entry.current_level = current_level
-            leaderboard_entry.last_updated = datetime.utcnow()
-            
-        except SQLAlchemyError as e:
-            logger.error(f"Error updating leaderboard: {e}")
+                          average_score: float, total_analyses: int, current_level: int,
+                          score_sum: int = 0, score_sq_sum: int = 0):
+        """Overwrite the leaderboard entry for user with the given aggregates"""
+        leaderboard_entry = session.query(Leaderboard).filter(
+            Leaderboard.username == username
+        ).first()
+        
+        if not leaderboard_entry:
+            leaderboard_entry = Leaderboard(username=username)
+            session.add(leaderboard_entry)
+        
+        leaderboard_entry.best_score = best_score
+        leaderboard_entry.average_score = average_score
+        leaderboard_entry.total_analyses = total_analyses
+        leaderboard_entry.current_level = current_level
+        leaderboard_entry.score_sum = score_sum
+        leaderboard_entry.score_sq_sum = score_sq_sum
+        leaderboard_entry.composite_score = composite_score(average_score, best_score)
+        leaderboard_entry.last_updated = datetime.utcnow()
     
-    def get_user_history(self, username: str, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get user's analysis history"""
+    def rebuild_user_stats(self, username: Optional[str] = None) -> int:
+        """Recompute the running aggregates from the analyses table
+        
+        Repairs users and leaderboard rows whose aggregates have drifted, e.g. after
+        analyses were deleted by hand. Analyses removed by cleanup_old_data stay
+        counted through the users' deleted_* totals. Rebuilds one user, or everyone
+        when username is None, and returns the number of users rebuilt.
+        """
         try:
             with self.get_session() as session:
-                analyses = session.query(Analysis).filter(
-                    Analysis.username == username
-                ).order_by(Analysis.created_at.desc()).limit(limit).all()
+                score = Analysis.green_score
+                query = session.query(
+                    Analysis.username, func.count(Analysis.id), func.max(score),
+                    func.sum(score), func.sum(score * score)
+                ).group_by(Analysis.username)
+                users = session.query(User)
+                if username is not None:
+                    query = query.filter(Analysis.username == username)
+                    users = users.filter(User.username == username)
+                users_by_name = {user.username: user for user in users.all()}
                 
-                return [{
-                    'id': a.id,
-                    'timestamp': a.created_at.isoformat(),
-                    'green_score': a.green_score,
-                    'lines_of_code': a.lines_of_code,
-                    'function_count': a.function_count,
-                    'issues_count': a.issues_count,
-                    'complexity_score': a.complexity_score,
-                    'security_score': a.security_score,
-                    'energy_consumption': a.energy_consumption,
-                    'carbon_emissions': a.carbon_emissions,
-                    'code_preview': a.code_preview
-                } for a in analyses]
+                rebuilt = set()
+                for name, total_analyses, best_score, score_sum, score_sq_sum in query.all():
+                    user = users_by_name.get(name)
+                    if user is None:
+                        continue
+                    stats = _lifetime_stats(user, total_analyses, best_score, score_sum, score_sq_sum)
+                    session.execute(update(User).where(User.username == name).values(**stats))
+                    self._sync_leaderboard(session, name)
+                    rebuilt.add(name)
+                
+                # Users whose live analyses have all been deleted keep only their deleted totals
+                for name, user in users_by_name.items():
+                    if name not in rebuilt and user.total_analyses != user.deleted_count:
+                        stats = _lifetime_stats(user, 0, 0, 0, 0)
+                        session.execute(update(User).where(User.username == name).values(**stats))
+                        self._sync_leaderboard(session, name)
+                        rebuilt.add(name)
+                
+                session.commit()
+                self.query_cache.clear()
+                logger.info(f"Rebuilt statistics for {len(rebuilt)} users")
+                return len(rebuilt)
                 
+        except SQLAlchemyError as e:
+            logger.error(f"Error rebuilding user stats: {e}")
+            return 0
+    
+    def get_user_history(self, username: str, limit: int = 50,
+                         cursor: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get user's analysis history, newest first
+        
+        Pass the next_cursor of get_user_history_page to continue after a page.
+        """
+        return self.get_user_history_page(username, limit, cursor)['items']
+    
+    def get_user_history_page(self, username: str, limit: int = 50,
+                              cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Get one page of the user's analysis history, newest first
+        
+        Returns {'items': [...], 'next_cursor': str or None}. Pages are keyset
+        paginated on (created_at, id), so each page costs the same however deep
+        it is and stays stable while new analyses are added. Raises ValueError for
+        a malformed cursor.
+        """
+        try:
+            return self.query_cache.get_or_load(
+                ('history', username, limit, cursor), [('user', username)],
+                lambda: self._load_history_page(username, limit, cursor)
+            )
         except SQLAlchemyError as e:
             logger.error(f"Error getting user history: {e}")
-            return []
+            return {'items': [], 'next_cursor': None}
+    
+    def _load_history_page(self, username: str, limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+        query = select(*_HISTORY_COLUMNS).where(Analysis.username == username)
+        if cursor is not None:
+            created_at, analysis_id = _decode_cursor(cursor)
+            query = query.where(tuple_(Analysis.created_at, Analysis.id) < tuple_(created_at, analysis_id))
+        # One extra row tells whether another page follows
+        query = query.order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(limit + 1)
+        
+        with self.get_session() as session:
+            rows = session.execute(query).all()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
+        
+        return {
+            'items': [{
+                'id': a.id,
+                'timestamp': a.created_at.isoformat(),
+                'green_score': a.green_score,
+                'lines_of_code': a.lines_of_code,
+                'function_count': a.function_count,
+                'issues_count': a.issues_count,
+                'complexity_score': a.complexity_score,
+                'security_score': a.security_score,
+                'energy_consumption': a.energy_consumption,
+                'carbon_emissions': a.carbon_emissions,
+                'code_preview': a.code_preview
+            } for a in rows],
+            'next_cursor': next_cursor
+        }
     
     def get_user_stats(self, username: str) -> Dict[str, Any]:
         """Get comprehensive user statistics"""
         try:
-            with self.get_session() as session:
-                user = session.query(User).filter(User.username == username).first()
-                
-                if not user:
-                    return {
-                        'total_analyses': 0,
-                        'average_score': 0,
-                        'best_score': 0,
-                        'current_level': 1,
-                        'improvement_trend': 0,
-                        'total_lines_analyzed': 0,
-                        'recent_score': 0
-                    }
-                
-                # Get recent analyses for trend calculation
-                recent_analyses = session.query(Analysis).filter(
-                    Analysis.username == username
-                ).order_by(Analysis.created_at.desc()).limit(10).all()
-                
-                improvement_trend = 0
-                recent_score = 0
-                total_lines = 0
-                
-                if recent_analyses:
-                    recent_score = recent_analyses[0].green_score
-                    total_lines = sum(a.lines_of_code for a in recent_analyses)
-                    
-                    if len(recent_analyses) >= 5:
-                        recent_avg = sum(a.green_score for a in recent_analyses[:5]) / 5
-                        older_section = recent_analyses[5:]
-                        older_avg = sum(a.green_score for a in older_section) / len(older_section) if len(older_section) > 0 else 0
-                        improvement_trend = recent_avg - older_avg
-                    else:
-                        improvement_trend = 0.0
-                
-                return {
-                    'total_analyses': user.total_analyses,
-                    'average_score': user.average_score,
-                    'best_score': user.best_score,
-                    'current_level': user.current_level,
-                    'improvement_trend': improvement_trend,
-                    'total_lines_analyzed': total_lines,
-                    'recent_score': recent_score
-                }
-                
+            return self.query_cache.get_or_load(('stats', username), [('user', username)],
+                                                lambda: self._load_user_stats(username))
         except SQLAlchemyError as e:
             logger.error(f"Error getting user stats: {e}")
             return {}
     
+    def _load_user_stats(self, username: str) -> Dict[str, Any]:
+        with self.get_session() as session:
+            user = session.query(User).filter(User.username == username).first()
+            
+            if not user:
+                return {
+                    'total_analyses': 0,
+                    'average_score': 0,
+                    'best_score': 0,
+                    'score_stddev': 0.0,
+                    'current_level': 1,
+                    'improvement_trend': 0,
+                    'total_lines_analyzed': 0,
+                    'recent_score': 0
+                }
+            
+            # Get recent analyses for trend calculation
+            recent_analyses = session.query(Analysis.green_score, Analysis.lines_of_code).filter(
+                Analysis.username == username
+            ).order_by(Analysis.created_at.desc(), Analysis.id.desc()).limit(10).all()
+            
+            improvement_trend = 0
+            recent_score = 0
+            total_lines = 0
+            
+            if recent_analyses:
+                recent_score = recent_analyses[0].green_score
+                total_lines = sum(a.lines_of_code for a in recent_analyses)
+                
+                if len(recent_analyses) >= 5:
+                    recent_avg = sum(a.green_score for a in recent_analyses[:5]) / 5
+                    older_section = recent_analyses[5:]
+                    older_avg = sum(a.green_score for a in older_section) / len(older_section) if len(older_section) > 0 else 0
+                    improvement_trend = recent_avg - older_avg
+                else:
+                    improvement_trend = 0.0
+            
+            return {
+                'total_analyses': user.total_analyses,
+                'average_score': user.average_score,
+                'best_score': user.best_score,
+                'score_stddev': _score_stddev(user.total_analyses, user.score_sum, user.score_sq_sum),
+                'current_level': user.current_level,
+                'improvement_trend': improvement_trend,
+                'total_lines_analyzed': total_lines,
+                'recent_score': recent_score
+            }
+    
     def get_leaderboard(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get top performers leaderboard"""
         try:
-            with self.get_session() as session:
-                leaders = session.query(Leaderboard).order_by(
-                    Leaderboard.average_score.desc(),
-                    Leaderboard.best_score.desc(),
-                    Leaderboard.total_analyses.desc()
-                ).limit(limit).all()
-                
-                return [{
-                    'username': leader.username,
-                    'best_score': leader.best_score,
-                    'average_score': leader.average_score,
-                    'total_analyses': leader.total_analyses,
-                    'current_level': leader.current_level,
-                    'composite_score': (leader.average_score * 0.7) + (leader.best_score * 0.3)
-                } for leader in leaders]
-                
+            return self.query_cache.get_or_load(('leaderboard', limit), ['leaderboard'],
+                                                lambda: self._load_leaderboard(limit))
         except SQLAlchemyError as e:
             logger.error(f"Error getting leaderboard: {e}")
             # Return fallback data for testing
             return [
                 {
+                    'rank': 1,
                     'username': 'Developer',
                     'best_score': 90,
                     'average_score': 85.0,
+                    'composite_score': composite_score(85.0, 90),
                     'total_analyses': 3,
                     'current_level': 2,
                     'total_carbon_saved': 0.5,
@@ -334,6 +862,64 @@ class DatabaseManager:
                 }
             ]
     
+    def _load_leaderboard(self, limit: int) -> List[Dict[str, Any]]:
+        with self.get_session() as session:
+            leaders = session.query(Leaderboard).order_by(*_RANKING).limit(limit).all()
+            return [self._leaderboard_dict(leader, rank) for rank, leader in enumerate(leaders, 1)]
+    
+    def _leaderboard_dict(self, leader: Leaderboard, rank: int) -> Dict[str, Any]:
+        return {
+            'rank': rank,
+            'username': leader.username,
+            'best_score': leader.best_score,
+            'average_score': leader.average_score,
+            'total_analyses': leader.total_analyses,
+            'current_level': leader.current_level,
+            'composite_score': leader.composite_score
+        }
+    
+    def get_leaderboard_position(self, username: str, neighbors: int = 2) -> Optional[Dict[str, Any]]:
+        """Get a user's rank with up to `neighbors` entries ranked directly above and below
+        
+        Returns {'rank', 'entry', 'above', 'below'}, with above and below in ranking
+        order, or None if the user is not on the leaderboard.
+        """
+        try:
+            return self.query_cache.get_or_load(('position', username, neighbors), ['leaderboard'],
+                                                lambda: self._load_leaderboard_position(username, neighbors))
+        except SQLAlchemyError as e:
+            logger.error(f"Error getting leaderboard position: {e}")
+            return None
+    
+    def _load_leaderboard_position(self, username: str, neighbors: int) -> Optional[Dict[str, Any]]:
+        with self.get_session() as session:
+            entry = session.query(Leaderboard).filter(Leaderboard.username == username).first()
+            if entry is None:
+                return None
+            
+            ahead = or_(Leaderboard.composite_score > entry.composite_score,
+                        and_(Leaderboard.composite_score == entry.composite_score,
+                             Leaderboard.username < entry.username))
+            behind = or_(Leaderboard.composite_score < entry.composite_score,
+                         and_(Leaderboard.composite_score == entry.composite_score,
+                              Leaderboard.username > entry.username))
+            
+            # Counting the entries ahead is a range scan of the ranking index
+            rank = session.query(func.count(Leaderboard.id)).filter(ahead).scalar() + 1
+            above = session.query(Leaderboard).filter(ahead).order_by(
+                Leaderboard.composite_score.asc(), Leaderboard.username.desc()
+            ).limit(neighbors).all()
+            below = session.query(Leaderboard).filter(behind).order_by(*_RANKING).limit(neighbors).all()
+            
+            return {
+                'rank': rank,
+                'entry': self._leaderboard_dict(entry, rank),
+                'above': [self._leaderboard_dict(leader, rank - offset)
+                          for offset, leader in reversed(list(enumerate(above, 1)))],
+                'below': [self._leaderboard_dict(leader, rank + offset)
+                          for offset, leader in enumerate(below, 1)]
+            }
+    
     def save_achievement(self, username: str, achievement_id: str, 
                         achievement_name: str, description: str = "") -> bool:
         """Save user achievement"""
@@ -385,50 +971,174 @@ class DatabaseManager:
             return []
     
     def get_analytics_summary(self) -> Dict[str, Any]:
-        """Get platform-wide analytics"""
+        """Get platform-wide analytics
+        
+        Served from the analytics_summary table. Once the row is older than
+        analytics_max_age seconds (GREENCODE_ANALYTICS_MAX_AGE) the stale row is
+        still returned while a background thread recomputes it; only one refresh
+        runs per process at a time. The very first read, before any row exists,
+        computes the summary synchronously.
+        """
+        summary = self._read_analytics_summary()
+        if summary is None:
+            with self._analytics_refresh_lock:
+                # Another caller may have created the row while this one waited
+                summary = self._read_analytics_summary()
+                if summary is None:
+                    return self.refresh_analytics_summary()
+        
+        if (summary and datetime.utcnow() - summary['refreshed_at'] >= timedelta(seconds=self.analytics_max_age)
+                and self._analytics_refresh_lock.acquire(blocking=False)):
+            threading.Thread(target=self._refresh_analytics_in_background,
+                             name='greencode-analytics-refresh', daemon=True).start()
+        return summary
+    
+    def _read_analytics_summary(self) -> Optional[Dict[str, Any]]:
+        """The stored summary, {} if it cannot be read, or None if it does not exist yet"""
         try:
             with self.get_session() as session:
-                total_users = session.query(User).count()
-                total_analyses = session.query(Analysis).count()
-                
-                if total_analyses > 0:
-                    avg_platform_score = session.query(Analysis.green_score).all()
-                    avg_score = sum(score[0] for score in avg_platform_score) / len(avg_platform_score)
-                    
-                    total_energy_saved = session.query(Analysis.energy_consumption).all()
-                    energy_saved = sum(energy[0] for energy in total_energy_saved if energy[0])
-                    
-                    total_carbon_saved = session.query(Analysis.carbon_emissions).all()
-                    carbon_saved = sum(carbon[0] for carbon in total_carbon_saved if carbon[0])
-                else:
-                    avg_score = 0
-                    energy_saved = 0
-                    carbon_saved = 0
-                
-                return {
-                    'total_users': total_users,
-                    'total_analyses': total_analyses,
-                    'average_platform_score': avg_score,
-                    'total_energy_saved': energy_saved,
-                    'total_carbon_saved': carbon_saved
-                }
-                
+                summary = session.get(AnalyticsSummary, 1)
+                return self._summary_dict(summary) if summary is not None else None
         except SQLAlchemyError as e:
             logger.error(f"Error getting analytics: {e}")
             return {}
     
-    def cleanup_old_data(self, days: int = 90):
-        """Clean up old analysis data (keep only recent records)"""
+    def _refresh_analytics_in_background(self):
+        """Run refresh_analytics_summary, then release the lock taken by get_analytics_summary"""
+        try:
+            self.refresh_analytics_summary()
+        finally:
+            self._analytics_refresh_lock.release()
+    
+    def refresh_analytics_summary(self) -> Dict[str, Any]:
+        """Recompute the platform analytics with one aggregate query and store them"""
         try:
             with self.get_session() as session:
-                cutoff_date = datetime.utcnow() - timedelta(days=days)
-                
-                deleted = session.query(Analysis).filter(
-                    Analysis.created_at < cutoff_date
-                ).delete()
+                total_users, total_analyses, avg_score, energy_saved, carbon_saved = session.execute(select(
+                    select(func.count(User.id)).scalar_subquery(),
+                    func.count(Analysis.id),
+                    func.coalesce(func.avg(Analysis.green_score), 0),
+                    func.coalesce(func.sum(Analysis.energy_consumption), 0),
+                    func.coalesce(func.sum(Analysis.carbon_emissions), 0)
+                )).one()
                 
+                summary = session.merge(AnalyticsSummary(
+                    id=1,
+                    total_users=total_users,
+                    total_analyses=total_analyses,
+                    average_platform_score=float(avg_score),
+                    total_energy_saved=float(energy_saved),
+                    total_carbon_saved=float(carbon_saved),
+                    refreshed_at=datetime.utcnow()
+                ))
+                result = self._summary_dict(summary)
                 session.commit()
-                logger.info(f"Cleaned up {deleted} old analysis records")
+                return result
                 
         except SQLAlchemyError as e:
-            logger.error(f"Error cleaning up data: {e}")
\ No newline at end of file
+            logger.error(f"Error refreshing analytics: {e}")
+            return {}
+    
+    def _summary_dict(self, summary: AnalyticsSummary) -> Dict[str, Any]:
+        return {
+            'total_users': summary.total_users,
+            'total_analyses': summary.total_analyses,
+            'average_platform_score': summary.average_platform_score,
+            'total_energy_saved': summary.total_energy_saved,
+            'total_carbon_saved': summary.total_carbon_saved,
+            'refreshed_at': summary.refreshed_at
+        }
+    
+    def cleanup_old_data(self, days: int = 90, batch_size: int = 5000, archive_dir: Optional[str] = None,
+                         archive_format: str = 'jsonl', pause_seconds: float = 0.0) -> Dict[str, Any]:
+        """Delete analyses older than `days`, in bounded batches, optionally archiving them first
+        
+        Expired rows are walked in primary-key order; each batch deletes one id
+        range in its own short transaction, so locks and WAL growth stay bounded
+        by batch_size. With archive_dir, every batch is written and fsynced to a
+        compressed archive (see retention.open_archive) before it is deleted; a
+        batch whose delete fails may therefore appear twice in archives after a
+        rerun. pause_seconds sleeps between batches to let replicas and vacuum
+        keep up. User and leaderboard statistics are lifetime aggregates: each
+        batch adds its rows to the users' deleted_* totals in the same
+        transaction, so they stay counted, including by rebuild_user_stats.
+        
+        Returns a report with the rows deleted and archived, batches, elapsed
+        seconds, rows per second, the archive path and size, and an 'error' key
+        if the job stopped early.
+        """
+        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        expired = Analysis.created_at < cutoff_date
+        report = {'cutoff': cutoff_date.isoformat(), 'deleted': 0, 'archived': 0, 'batches': 0}
+        archive = open_archive(archive_dir, Analysis.__tablename__, cutoff_date, archive_format) if archive_dir else None
+        start = time.perf_counter()
+        last_id = None
+        
+        try:
+            while True:
+                with self.get_session() as session:
+                    query = select(*Analysis.__table__.columns) if archive else select(Analysis.id)
+                    query = query.where(expired)
+                    if last_id is not None:
+                        query = query.where(Analysis.id > last_id)
+                    rows = session.execute(query.order_by(Analysis.id).limit(batch_size)).all()
+                    if not rows:
+                        break
+                    
+                    first_id, last_id = rows[0].id, rows[-1].id
+                    if archive:
+                        archive.write_batch([row._asdict() for row in rows])
+                        report['archived'] += len(rows)
+                    
+                    # Ids need not follow created_at, so the range may hold newer rows; keep those
+                    removed = and_(Analysis.id.between(first_id, last_id), expired)
+                    self._record_deleted_totals(session, removed)
+                    deleted = session.execute(Analysis.__table__.delete().where(removed)).rowcount
+                    session.commit()
+                
+                report['deleted'] += deleted
+                report['batches'] += 1
+                logger.info(f"Retention batch {report['batches']}: deleted {deleted} analyses up to id {last_id}")
+                if pause_seconds:
+                    time.sleep(pause_seconds)
+                    
+        except (SQLAlchemyError, OSError) as e:
+            logger.error(f"Error cleaning up data: {e}")
+            report['error'] = str(e)
+        finally:
+            if archive:
+                archive.close()
+                report['archive_path'] = archive.path
+                report['archive_bytes'] = archive.size_bytes()
+            if report['deleted']:
+                self.query_cache.clear()
+        
+        elapsed = time.perf_counter() - start
+        report['elapsed_seconds'] = round(elapsed, 3)
+        report['rows_per_second'] = round(report['deleted'] / elapsed, 1) if elapsed > 0 else 0.0
+        logger.info(f"Cleaned up {report['deleted']} old analysis records in {elapsed:.2f}s "
+                    f"({report['rows_per_second']} rows/s)")
+        return report
+    
+    def _record_deleted_totals(self, session: Session, removed):
+        """Add the analyses matching `removed` to their users' deleted_* totals"""
+        score = Analysis.green_score
+        groups = session.execute(
+            select(Analysis.username, func.count(Analysis.id), func.sum(score),
+                   func.sum(score * score), func.max(score)).where(removed).group_by(Analysis.username)
+        ).all()
+        if not groups:
+            return
+        users = User.__table__
+        session.execute(
+            users.update().where(users.c.username == bindparam('removed_username')).values(
+                deleted_count=users.c.deleted_count + bindparam('removed_count'),
+                deleted_score_sum=users.c.deleted_score_sum + bindparam('removed_sum'),
+                deleted_score_sq_sum=users.c.deleted_score_sq_sum + bindparam('removed_sq_sum'),
+                deleted_best_score=case((users.c.deleted_best_score < bindparam('removed_best'),
+                                         bindparam('removed_best')), else_=users.c.deleted_best_score)
+            ),
+            [{'removed_username': name, 'removed_count': count, 'removed_sum': score_sum,
+              'removed_sq_sum': score_sq_sum, 'removed_best': best_score}
+             for name, count, score_sum, score_sq_sum, best_score in groups]
+        )
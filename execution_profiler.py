@@ -0,0 +1,164 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional
+
+class MeasurementError(Exception):
+    """Raised when the measured code cannot be run to completion"""
+    pass
+
+# Executed by a fresh, isolated interpreter. Reads the job from stdin and writes the
+# measurements to the file named by argv[1], so output printed by the measured code
+# cannot corrupt the result.
+_RUNNER = r'''
+import contextlib, gc, io, json, sys, time, traceback, tracemalloc
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def rusage():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    scale = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is KiB on Linux, bytes on macOS
+    return {
+        'user_s': usage.ru_utime, 'system_s': usage.ru_stime,
+        'max_rss_bytes': usage.ru_maxrss * scale,
+        'minor_page_faults': usage.ru_minflt, 'major_page_faults': usage.ru_majflt,
+        'voluntary_context_switches': usage.ru_nvcsw, 'involuntary_context_switches': usage.ru_nivcsw,
+        'block_input_ops': usage.ru_inblock, 'block_output_ops': usage.ru_oublock
+    }
+
+def gc_collections():
+    return sum(generation['collections'] for generation in gc.get_stats())
+
+job = json.loads(sys.stdin.read())
+result = {}
+captured = io.StringIO()
+try:
+    namespace = {'__name__': '__measured__'}
+    with contextlib.redirect_stdout(captured), contextlib.redirect_stderr(captured):
+        exec(compile(job['code'], '<measured>', 'exec'), namespace)
+        entry = namespace.get(job['entry_point'])
+        if not callable(entry):
+            raise NameError(f"Entry point {job['entry_point']!r} is not a callable defined by the code")
+
+        before = rusage()
+        gc_before = gc_collections()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        for _ in range(job['repeat']):
+            entry(*job['args'])
+        result['wall_s'] = time.perf_counter() - wall_start
+        result['cpu_s'] = time.process_time() - cpu_start
+        result['gc_collections'] = gc_collections() - gc_before
+        after = rusage()
+
+        if job['trace_allocations']:
+            # Separate run: tracing slows execution and would distort the timings above
+            tracemalloc.start()
+            entry(*job['args'])
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            stats = snapshot.statistics('filename')
+            result['allocations'] = {
+                'peak_traced_bytes': peak,
+                'retained_bytes': current,
+                'retained_blocks': sum(stat.count for stat in stats)
+            }
+
+    if before is not None:
+        result['peak_rss_bytes'] = after['max_rss_bytes']
+        result['counters'] = {key: after[key] - before[key] for key in after if key != 'max_rss_bytes'}
+except BaseException:
+    result['error'] = traceback.format_exc(limit=5)
+result['output'] = captured.getvalue()[-4000:]
+
+with open(sys.argv[1], 'w') as f:
+    json.dump(result, f)
+'''
+
+class CpuPowerModel:
+    """Converts measured CPU time and memory residency into energy
+
+    cpu_watts is the power attributed to one fully busy core; memory_watts_per_gb
+    is the DRAM power per resident gigabyte over the wall-clock run time.
+    """
+
+    def __init__(self, cpu_watts: float = 15.0, memory_watts_per_gb: float = 0.375):
+        self.cpu_watts = cpu_watts
+        self.memory_watts_per_gb = memory_watts_per_gb
+
+    def energy_joules(self, measurement: Dict[str, Any]) -> Dict[str, float]:
+        cpu_joules = measurement['cpu_s'] * self.cpu_watts
+        resident_gb = (measurement.get('peak_rss_bytes') or 0) / 1e9
+        memory_joules = resident_gb * self.memory_watts_per_gb * measurement['wall_s']
+        return {'cpu_joules': cpu_joules, 'memory_joules': memory_joules}
+
+class ExecutionProfiler:
+    """Measures real resource usage by running an entry point in an isolated subprocess"""
+
+    def __init__(self, timeout: float = 60.0, memory_limit_mb: Optional[int] = None,
+                 python_executable: Optional[str] = None):
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.python_executable = python_executable or sys.executable
+
+    def measure(self, code: str, entry_point: str = 'main', args: Optional[List[Any]] = None,
+                repeat: int = 1, trace_allocations: bool = True) -> Dict[str, Any]:
+        """Run entry_point(*args) repeat times and return CPU, wall, RSS, allocation and counter data
+
+        The code runs in a fresh interpreter in isolated mode (-I) inside an empty
+        temporary directory. Raises MeasurementError on timeout, crash or an
+        exception from the measured code.
+        """
+        job = json.dumps({
+            'code': code,
+            'entry_point': entry_point,
+            'args': list(args or []),
+            'repeat': max(1, repeat),
+            'trace_allocations': trace_allocations
+        })
+
+        measurement = run_isolated(_RUNNER, job, self.timeout, self.memory_limit_mb, self.python_executable)
+
+        if 'error' in measurement:
+            raise MeasurementError(f"Measured code raised an exception:\n{measurement['error']}")
+
+        measurement['repeat'] = max(1, repeat)
+        return measurement
+
+def run_isolated(runner: str, job: str, timeout: float, memory_limit_mb: Optional[int] = None,
+                 python_executable: Optional[str] = None) -> Dict[str, Any]:
+    """Run a runner script in a fresh isolated interpreter and return the JSON it writes
+
+    The runner receives job on stdin and the result file path as argv[1]; it runs
+    in isolated mode (-I) inside an empty temporary directory. Raises
+    MeasurementError on timeout or if no result is written.
+    """
+    def limit_memory():
+        import resource
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    with tempfile.TemporaryDirectory(prefix='greencode-measure-') as workdir:
+        result_path = os.path.join(workdir, 'result.json')
+        try:
+            completed = subprocess.run(
+                [python_executable or sys.executable, '-I', '-c', runner, result_path],
+                input=job, capture_output=True, text=True, cwd=workdir,
+                timeout=timeout, preexec_fn=limit_memory if memory_limit_mb else None
+            )
+        except subprocess.TimeoutExpired:
+            raise MeasurementError(f"Measured code did not finish within {timeout} seconds")
+
+        try:
+            with open(result_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise MeasurementError(
+                f"Measurement process exited with code {completed.returncode}: {completed.stderr.strip()[-2000:]}"
+            )
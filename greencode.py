@@ -0,0 +1,330 @@
+import argparse
+import json
+import os
+import sys
+import time
+from batch_scanner import DEFAULT_CHUNK_BYTES, scan_directory
+from autofix import autofix_directory
+from analysis_cache import AnalysisCache
+from incremental import GitError, IncrementalAnalyzer
+from instrumentation import TimingHistograms
+from issues import to_jsonable
+from carbon_calculator import CarbonCalculator
+from execution_profiler import CpuPowerModel, ExecutionProfiler, MeasurementError
+from refactor_benchmark import RefactorBenchmark, measure_refactor_scaling
+from ai_refactor import AIRefactorEngine
+
+def scan_record_to_analysis(result, username):
+    """save_analyses_bulk record for one scan result"""
+    return {
+        'username': username,
+        'green_score': result['green_score'],
+        'analysis_results': result,
+        'security_score': result['security_score'],
+        'energy_consumption': result['energy_consumption'],
+        'carbon_emissions': result['carbon_emissions'],
+        # The path identifies the file in the history view
+        'code_snippet': result['path']
+    }
+
+def cmd_scan(args) -> int:
+    """Scan a directory and stream one JSON result per file"""
+    db_manager = None
+    if args.save_as:
+        # Imported here so scanning works without a database configured
+        from database import BULK_CHUNK_SIZE, DatabaseManager
+        try:
+            db_manager = DatabaseManager()
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            return 1
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    start = time.perf_counter()
+    file_count = 0
+    error_count = 0
+    histograms = TimingHistograms()
+    pending = []
+    save_counts = {'saved': 0, 'error': 0}
+
+    def save_pending():
+        for status in db_manager.save_analyses_bulk(pending):
+            save_counts[status['status']] += 1
+        pending.clear()
+
+    try:
+        cache_dir = None if args.no_cache else args.cache_dir
+        for result in scan_directory(args.directory, workers=args.workers, chunk_bytes=args.chunk_bytes,
+                                     cache_dir=cache_dir, profile=args.profile):
+            file_count += 1
+            if 'error' in result:
+                error_count += 1
+            elif db_manager is not None:
+                pending.append(scan_record_to_analysis(result, args.save_as))
+                if len(pending) >= BULK_CHUNK_SIZE:
+                    save_pending()
+            if 'timings' in result:
+                histograms.record(result['timings'])
+            output.write(json.dumps(result, default=to_jsonable) + '\n')
+            output.flush()
+        if pending:
+            save_pending()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Scanned {file_count} files ({error_count} errors) in {elapsed:.2f}s", file=sys.stderr)
+    if db_manager is not None:
+        print(f"Saved {save_counts['saved']} analyses as {args.save_as} ({save_counts['error']} failed)",
+              file=sys.stderr)
+    if args.profile:
+        print(json.dumps(histograms.summary(), indent=2), file=sys.stderr)
+    return 0
+
+def cmd_diff(args) -> int:
+    """Analyze only the Python files changed between two revisions"""
+    cache = AnalysisCache(cache_dir=None if args.no_cache else args.cache_dir)
+    incremental = IncrementalAnalyzer(cache)
+    start = time.perf_counter()
+    file_count = 0
+
+    try:
+        for result in incremental.analyze_revision_diff(args.repo, args.base, args.head):
+            file_count += 1
+            sys.stdout.write(json.dumps(result, default=to_jsonable) + '\n')
+            sys.stdout.flush()
+    except GitError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+
+    elapsed = time.perf_counter() - start
+    print(f"Analyzed {file_count} changed files in {elapsed:.2f}s", file=sys.stderr)
+    return 0
+
+def cmd_measure(args) -> int:
+    """Run an entry point in a subprocess and report measured energy and carbon"""
+    with open(args.file, 'r', encoding='utf-8') as f:
+        code = f.read()
+
+    profiler = ExecutionProfiler(timeout=args.timeout, memory_limit_mb=args.memory_limit_mb)
+    try:
+        measurement = profiler.measure(code, args.entry, json.loads(args.args), repeat=args.repeat,
+                                       trace_allocations=not args.no_tracemalloc)
+    except MeasurementError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    carbon_calc = CarbonCalculator(CpuPowerModel(args.cpu_watts, args.memory_watts_per_gb))
+    energy_data = carbon_calc.calculate_measured_energy(measurement)
+    carbon_data = carbon_calc.calculate_carbon_footprint(energy_data)
+    print(json.dumps({
+        'path': args.file,
+        'entry_point': args.entry,
+        'measurement': measurement,
+        'energy_consumption': energy_data['total_energy_uj'],
+        'carbon_emissions': carbon_data['carbon_emissions_g'],
+        'energy_breakdown': energy_data['energy_breakdown']
+    }, indent=2))
+    return 0
+
+def cmd_bench(args) -> int:
+    """Check a refactored function against the original and report the measured speedup"""
+    with open(args.original, 'r', encoding='utf-8') as f:
+        original_code = f.read()
+    with open(args.refactored, 'r', encoding='utf-8') as f:
+        refactored_code = f.read()
+
+    benchmark = RefactorBenchmark(repeat=args.repeat, warmup=args.warmup, timeout=args.timeout)
+    inputs = json.loads(args.inputs) if args.inputs else None
+    try:
+        report = AIRefactorEngine().validate_refactor(original_code, refactored_code, args.function,
+                                                      inputs, benchmark)
+    except (MeasurementError, ValueError, SyntaxError) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    print(json.dumps(report, indent=2))
+    return 0 if report['accepted'] else 1
+
+def cmd_refactor_scaling(args) -> int:
+    """Check that refactoring time grows linearly with input size"""
+    report = measure_refactor_scaling(args.sizes, repeat=args.repeat, seed=args.seed)
+    print(json.dumps(report, indent=2))
+    return 0 if report['linear'] else 1
+
+def cmd_autofix(args) -> int:
+    """Refactor a directory in parallel and write unified diffs"""
+    start = time.perf_counter()
+    counts = {'fixed': 0, 'unchanged': 0, 'skipped': 0, 'error': 0}
+    patches = []
+
+    if args.patch_dir:
+        os.makedirs(args.patch_dir, exist_ok=True)
+
+    for result in autofix_directory(args.directory, workers=args.workers, chunk_bytes=args.chunk_bytes):
+        counts[result['status']] += 1
+        if result['status'] in ('skipped', 'error'):
+            print(f"{result['path']}: {result['status']} ({result['reason']})", file=sys.stderr)
+        if result['status'] != 'fixed':
+            continue
+        if args.patch_dir:
+            patch_name = result['path'].replace('/', '__') + '.patch'
+            with open(os.path.join(args.patch_dir, patch_name), 'w', encoding='utf-8', newline='') as f:
+                f.write(result['diff'])
+        else:
+            patches.append(result)
+
+    if not args.patch_dir:
+        # One combined patch, ordered by path so reruns produce identical output
+        output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+        try:
+            for result in sorted(patches, key=lambda result: result['path']):
+                output.write(result['diff'])
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Fixed {counts['fixed']} files, {counts['unchanged']} unchanged, {counts['skipped']} skipped, "
+          f"{counts['error']} errors in {elapsed:.2f}s", file=sys.stderr)
+    return 0
+
+def cmd_rebuild_stats(args) -> int:
+    """Recompute user and leaderboard aggregates from the stored analyses"""
+    # Imported here so the analysis commands work without a database configured
+    from database import DatabaseManager
+    try:
+        db_manager = DatabaseManager()
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    start = time.perf_counter()
+    rebuilt = db_manager.rebuild_user_stats(args.username)
+    print(f"Rebuilt statistics for {rebuilt} users in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    return 0
+
+def cmd_refresh_analytics(args) -> int:
+    """Recompute the platform analytics summary"""
+    from database import DatabaseManager
+    try:
+        db_manager = DatabaseManager()
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    summary = db_manager.refresh_analytics_summary()
+    if not summary:
+        return 1
+    print(json.dumps(summary, indent=2, default=str))
+    return 0
+
+def cmd_cleanup(args) -> int:
+    """Delete (and optionally archive) analyses older than the retention period"""
+    from database import DatabaseManager
+    try:
+        db_manager = DatabaseManager()
+        report = db_manager.cleanup_old_data(args.days, batch_size=args.batch_size, archive_dir=args.archive_dir,
+                                             archive_format=args.format, pause_seconds=args.pause)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    print(json.dumps(report, indent=2))
+    return 1 if 'error' in report else 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='greencode', description='Green Code Checker command line tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    scan = subparsers.add_parser('scan', help='Analyze every .py file in a directory')
+    scan.add_argument('directory', help='Root directory to scan')
+    scan.add_argument('-j', '--workers', type=int, default=None,
+                      help='Number of worker processes (default: all cores)')
+    scan.add_argument('--chunk-bytes', type=int, default=DEFAULT_CHUNK_BYTES,
+                      help='Approximate amount of source per worker task')
+    scan.add_argument('--cache-dir', default=os.getenv('GREENCODE_CACHE_DIR', '.greencode_cache'),
+                      help='Directory for the on-disk result cache')
+    scan.add_argument('--no-cache', action='store_true', help='Analyze every file even if unchanged')
+    scan.add_argument('--profile', action='store_true',
+                      help='Record per-stage timings on each result and print aggregate histograms')
+    scan.add_argument('-o', '--output', help='Write JSON Lines to this file instead of stdout')
+    scan.add_argument('--save-as', metavar='USERNAME',
+                      help='Also save each result to the database (DATABASE_URL) under this username')
+    scan.set_defaults(func=cmd_scan)
+
+    diff = subparsers.add_parser('diff', help='Incrementally analyze files changed between two git revisions')
+    diff.add_argument('base', help='Base revision, e.g. origin/main')
+    diff.add_argument('head', nargs='?', default='HEAD', help='Head revision (default: HEAD)')
+    diff.add_argument('--repo', default='.', help='Path to the git repository')
+    diff.add_argument('--cache-dir', default=os.getenv('GREENCODE_CACHE_DIR', '.greencode_cache'),
+                      help='Directory for the on-disk segment cache')
+    diff.add_argument('--no-cache', action='store_true', help='Keep the segment cache in memory only')
+    diff.set_defaults(func=cmd_diff)
+
+    measure = subparsers.add_parser('measure', help='Measure real energy use by running an entry point')
+    measure.add_argument('file', help='Python file defining the entry point')
+    measure.add_argument('--entry', default='main', help='Function to call (default: main)')
+    measure.add_argument('--args', default='[]', help='JSON list of positional arguments for the entry point')
+    measure.add_argument('--repeat', type=int, default=1, help='Number of timed calls; results are per call')
+    measure.add_argument('--timeout', type=float, default=60.0, help='Seconds before the run is killed')
+    measure.add_argument('--memory-limit-mb', type=int, default=None,
+                         help='Address-space limit for the measured process (POSIX only)')
+    measure.add_argument('--cpu-watts', type=float, default=15.0, help='Power drawn by one busy core')
+    measure.add_argument('--memory-watts-per-gb', type=float, default=0.375,
+                         help='DRAM power per resident gigabyte')
+    measure.add_argument('--no-tracemalloc', action='store_true', help='Skip the allocation-tracing run')
+    measure.set_defaults(func=cmd_measure)
+
+    bench = subparsers.add_parser('bench', help='Verify and time a refactored function against the original')
+    bench.add_argument('original', help='File with the original function')
+    bench.add_argument('refactored', help='File with the refactored function')
+    bench.add_argument('--function', required=True, help='Name of the function to compare')
+    bench.add_argument('--inputs', help='JSON list of argument lists (default: generated from the signature)')
+    bench.add_argument('--repeat', type=int, default=15, help='Timed samples per version')
+    bench.add_argument('--warmup', type=int, default=3, help='Untimed calls before sampling')
+    bench.add_argument('--timeout', type=float, default=120.0, help='Seconds before the run is killed')
+    bench.set_defaults(func=cmd_bench)
+
+    autofix = subparsers.add_parser('autofix', help='Apply safe refactors across a directory as unified diffs')
+    autofix.add_argument('directory', help='Root directory to refactor')
+    autofix.add_argument('-j', '--workers', type=int, default=None,
+                         help='Number of worker processes (default: all cores)')
+    autofix.add_argument('--chunk-bytes', type=int, default=DEFAULT_CHUNK_BYTES,
+                         help='Approximate amount of source per worker task')
+    autofix.add_argument('--patch-dir', help='Write one .patch file per changed file into this directory')
+    autofix.add_argument('-o', '--output', help='Write the combined patch to this file instead of stdout')
+    autofix.set_defaults(func=cmd_autofix)
+
+    scaling = subparsers.add_parser('refactor-scaling',
+                                    help='Fuzz the refactor engine at growing sizes and check time is linear')
+    scaling.add_argument('--sizes', type=int, nargs='+', default=[2000, 4000, 8000, 16000, 32000],
+                         help='Input sizes in lines')
+    scaling.add_argument('--repeat', type=int, default=3, help='Runs per size; the fastest is used')
+    scaling.add_argument('--seed', type=int, default=0, help='Seed for the generated inputs')
+    scaling.set_defaults(func=cmd_refactor_scaling)
+
+    rebuild = subparsers.add_parser('rebuild-stats',
+                                    help='Recompute user and leaderboard statistics from the analyses table '
+                                         '(analyses removed by cleanup stay counted)')
+    rebuild.add_argument('--username', help='Rebuild only this user (default: everyone)')
+    rebuild.set_defaults(func=cmd_rebuild_stats)
+
+    refresh = subparsers.add_parser('refresh-analytics', help='Recompute the platform analytics summary')
+    refresh.set_defaults(func=cmd_refresh_analytics)
+
+    cleanup = subparsers.add_parser('cleanup', help='Delete old analyses in batches, optionally archiving them')
+    cleanup.add_argument('--days', type=int, default=90, help='Keep analyses newer than this many days')
+    cleanup.add_argument('--batch-size', type=int, default=5000, help='Rows deleted per transaction')
+    cleanup.add_argument('--archive-dir', help='Archive expired rows into this directory before deleting them')
+    cleanup.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl',
+                         help='Archive format: gzip JSON Lines, or zstd Parquet (requires pyarrow)')
+    cleanup.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+    cleanup.set_defaults(func=cmd_cleanup)
+
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
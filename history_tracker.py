@@ -2,18 +2,24 @@ import json
 import os
 from datetime import datetime
 from typing import List, Dict, Any
-from database import DatabaseManager
+from database import DatabaseManager, composite_score
+from write_behind import get_write_behind_queue, write_behind_enabled
 
 class HistoryTracker:
     """Tracks and manages green score history with database persistence"""
     
-    def __init__(self, use_database: bool = True):
+    def __init__(self, use_database: bool = True, write_behind: bool = None):
         self.use_database = use_database
         self.db_manager = None
+        self.write_queue = None
         
         if use_database:
             try:
                 self.db_manager = DatabaseManager()
+                # Persist analyses on a background thread unless GREENCODE_WRITE_BEHIND=0
+                enabled = write_behind_enabled() if write_behind is None else write_behind
+                if enabled:
+                    self.write_queue = get_write_behind_queue(self.db_manager)
             except Exception as e:
                 print(f"Database unavailable, falling back to file storage: {e}")
                 self.use_database = False
@@ -43,8 +49,23 @@ class HistoryTracker:
     def add_analysis(self, username: str, green_score: int, analysis_results: Dict[str, Any], 
                     code_snippet: str = "", security_score: int = 100, 
                     energy_consumption: float = 0.0, carbon_emissions: float = 0.0):
-        """Add a new analysis to history"""
+        """Add a new analysis to history
+        
+        With the write-behind queue the analysis is saved asynchronously, so reads
+        may not include it until the next flush (GREENCODE_WRITE_FLUSH_INTERVAL).
+        """
         if self.use_database and self.db_manager:
+            if self.write_queue is not None and self.write_queue.submit({
+                'username': username,
+                'green_score': green_score,
+                'analysis_results': analysis_results,
+                'security_score': security_score,
+                'energy_consumption': energy_consumption,
+                'carbon_emissions': carbon_emissions,
+                'code_snippet': code_snippet
+            }):
+                return True
+            # Queue disabled, closed or full: write synchronously so nothing is lost
             return self.db_manager.save_analysis(
                 username, green_score, analysis_results, security_score,
                 energy_consumption, carbon_emissions, code_snippet
@@ -147,13 +168,31 @@ class HistoryTracker:
                         'average_score': avg_score,
                         'best_score': best_score,
                         'total_analyses': total_analyses,
-                        'composite_score': (avg_score * 0.7) + (best_score * 0.3)  # Weighted score
+                        'composite_score': composite_score(avg_score, best_score)
                     })
             
-            # Sort by composite score
-            leaderboard.sort(key=lambda x: x['composite_score'], reverse=True)
+            # Same order as the database leaderboard: composite score, then username
+            leaderboard.sort(key=lambda x: (-x['composite_score'], x['username']))
+            for rank, entry in enumerate(leaderboard, 1):
+                entry['rank'] = rank
             return leaderboard[:limit]
     
+    def get_leaderboard_position(self, username: str, neighbors: int = 2) -> Dict[str, Any]:
+        """Get a user's leaderboard rank and the entries ranked around them, or None if unranked"""
+        if self.use_database and self.db_manager:
+            return self.db_manager.get_leaderboard_position(username, neighbors)
+        
+        leaderboard = self.get_leaderboard(limit=len(self.history_data))
+        for index, entry in enumerate(leaderboard):
+            if entry['username'] == username:
+                return {
+                    'rank': entry['rank'],
+                    'entry': entry,
+                    'above': leaderboard[max(index - neighbors, 0):index],
+                    'below': leaderboard[index + 1:index + 1 + neighbors]
+                }
+        return None
+    
     def clear_history(self):
         """Clear all history data"""
         self.history_data = []
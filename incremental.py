@@ -0,0 +1,229 @@
+import re
+import subprocess
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from analyzer import CodeAnalyzer
+from security_checker import SecurityChecker
+from carbon_calculator import CarbonCalculator
+from parsed_source import ParsedSource
+from limits import InputTooLargeError
+from analysis_cache import AnalysisCache
+from rule_engine import Scope
+from rules import RULESET_VERSION, run_rules
+from batch_scanner import build_record
+
+HUNK_HEADER = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+
+class GitError(Exception):
+    """Raised when a git command fails"""
+    pass
+
+def _git(repo: str, *args: str) -> str:
+    try:
+        completed = subprocess.run(['git', '-C', repo, *args], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        stderr = getattr(e, 'stderr', '') or str(e)
+        raise GitError(f"git {' '.join(args)} failed: {stderr.strip()}")
+    return completed.stdout
+
+def changed_python_files(repo: str, base: str, head: str) -> List[str]:
+    """Python files added, modified or renamed between two revisions (paths as of head)"""
+    output = _git(repo, 'diff', '--name-only', '--diff-filter=AMR', base, head, '--', '*.py')
+    return [line for line in output.splitlines() if line]
+
+def changed_line_ranges(repo: str, base: str, head: str, path: str) -> List[Tuple[int, int]]:
+    """Inclusive line ranges in the head version of a file touched by the diff"""
+    output = _git(repo, 'diff', '-U0', base, head, '--', path)
+    ranges = []
+
+    for line in output.splitlines():
+        match = HUNK_HEADER.match(line)
+        if not match:
+            continue
+        start = int(match.group(1))
+        count = int(match.group(2)) if match.group(2) is not None else 1
+        if count == 0:
+            # Pure deletion: lines on both sides of the removed block are affected
+            ranges.append((max(start, 1), start + 1))
+        else:
+            ranges.append((start, start + count - 1))
+
+    return ranges
+
+def split_top_level_segments(source: ParsedSource) -> List[Tuple[int, int]]:
+    """Partition a file into inclusive line ranges, one per top-level statement
+
+    Blank and comment lines before a statement belong to it and trailing lines
+    belong to the last one, so line-based scanners see every line exactly once.
+    """
+    line_count = len(source.lines)
+    segments = []
+
+    for node in source.tree.body:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+        end = node.end_lineno or node.lineno
+        if segments and start <= segments[-1][1]:
+            # Statements sharing a line (e.g. "a = 1; b = 2") stay together
+            segments[-1] = (segments[-1][0], max(segments[-1][1], end))
+        else:
+            segments.append((start, end))
+
+    if not segments:
+        return [(1, line_count)]
+
+    # Extend each segment back to the end of the previous one, and the last one to EOF
+    partition = []
+    previous_end = 0
+    for start, end in segments:
+        partition.append((previous_end + 1, end))
+        previous_end = end
+    partition[-1] = (partition[-1][0], max(partition[-1][1], line_count))
+
+    return partition
+
+class IncrementalAnalyzer:
+    """Re-analyzes only the top-level definitions touched by a diff and merges cached results for the rest"""
+
+    def __init__(self, cache: Optional[AnalysisCache] = None):
+        self.cache = cache or AnalysisCache()
+        self.analyzer = CodeAnalyzer()
+        self.security_checker = SecurityChecker()
+        self.carbon_calc = CarbonCalculator()
+
+    def analyze_revision_diff(self, repo: str, base: str, head: str = 'HEAD') -> Iterator[Dict[str, Any]]:
+        """Yield a full per-file report for every Python file changed between base and head"""
+        for path in changed_python_files(repo, base, head):
+            code = _git(repo, 'show', f"{head}:{path}")
+            changed_ranges = changed_line_ranges(repo, base, head, path)
+            record = self.analyze_file(code, changed_ranges)
+            record['path'] = path
+            yield record
+
+    def analyze_file(self, code: str, changed_ranges: List[Tuple[int, int]]) -> Dict[str, Any]:
+        """Analyze one file, reusing cached segment summaries outside the changed ranges"""
+        source = ParsedSource(code)
+        try:
+            source.check_limits()
+        except InputTooLargeError as e:
+            return {'error': str(e)}
+        if not source.is_valid:
+            return {'error': f"Invalid Python syntax: {source.syntax_error}"}
+
+        summaries = []
+        reanalyzed = 0
+
+        for start, end in split_top_level_segments(source):
+            segment_code = '\n'.join(source.lines[start - 1:end])
+            affected = any(start <= range_end and range_start <= end
+                           for range_start, range_end in changed_ranges)
+
+            summary, was_analyzed = self._get_segment_summary(segment_code, affected, source)
+            reanalyzed += was_analyzed
+            summaries.append((start - 1, summary))
+
+        analysis_results, security_analysis = self._merge_summaries(summaries)
+        record = build_record(self.analyzer, analysis_results, security_analysis, self.carbon_calc)
+        record['segments_reanalyzed'] = reanalyzed
+        record['segments_cached'] = len(summaries) - reanalyzed
+        return record
+
+    def _get_segment_summary(self, segment_code: str, affected: bool,
+                             source: ParsedSource) -> Tuple[Dict[str, Any], bool]:
+        # Segments share the whole file's limits and time budget
+        segment = ParsedSource(segment_code, limits=source.limits)
+        segment.deadline = source.deadline
+        cache_key = AnalysisCache.make_key('segment', RULESET_VERSION, segment.content_hash)
+
+        if not affected:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached, False
+
+        summary = self._summarize_segment(segment)
+        if segment.partial_reason is not None:
+            # Incomplete summaries are used once but never cached
+            summary['partial_reason'] = segment.partial_reason
+        else:
+            self.cache.set(cache_key, summary)
+        return summary, True
+
+    def _summarize_segment(self, segment: ParsedSource) -> Dict[str, Any]:
+        """Collect everything needed to rebuild whole-file results, with segment-relative line numbers"""
+        context = run_rules(segment)
+
+        module_imports = []
+        nested_imports = []
+        for imp in context.imports:
+            if imp['scope'] is not None and imp['scope'].parent is None:
+                module_imports.append({k: v for k, v in imp.items() if k != 'scope'})
+            else:
+                nested_imports.append(imp)
+
+        root_scope = _root_scope(context)
+        return {
+            'lines_of_code': self.analyzer._count_lines_of_code(segment.lines),
+            'stats': dict(context.stats),
+            'nested_depth': context.nested_depth,
+            'rule_issues': list(context.issues['efficiency']),
+            'inefficient_patterns': self.analyzer._find_inefficient_patterns(segment.lines, segment),
+            # Imports inside functions/classes can be judged within the segment itself
+            'nested_unused_imports': self.analyzer._find_unused_imports(nested_imports),
+            'module_imports': module_imports,
+            'module_loads': sorted(root_scope.loads) if root_scope else [],
+            'pattern_security_issues': self.security_checker._scan_patterns(segment),
+            'ast_security_issues': list(context.issues['security'])
+        }
+
+    def _merge_summaries(self, summaries: List[Tuple[int, Dict[str, Any]]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Combine per-segment summaries into whole-file analysis and security results"""
+        lines_of_code = 0
+        stats: Dict[str, int] = {}
+        nested_depth = 0
+        rule_issues, inefficient_patterns, unused_imports = [], [], []
+        pattern_security, ast_security = [], []
+        module_imports = []
+        module_scope = Scope(None)
+        partial_reason = None
+
+        for offset, summary in summaries:
+            partial_reason = partial_reason or summary.get('partial_reason')
+            lines_of_code += summary['lines_of_code']
+            for name, value in summary['stats'].items():
+                stats[name] = stats.get(name, 0) + value
+            nested_depth = max(nested_depth, summary['nested_depth'])
+
+            rule_issues.extend(_shift(summary['rule_issues'], offset))
+            inefficient_patterns.extend(_shift(summary['inefficient_patterns'], offset))
+            unused_imports.extend(_shift(summary['nested_unused_imports'], offset))
+            pattern_security.extend(_shift(summary['pattern_security_issues'], offset))
+            ast_security.extend(_shift(summary['ast_security_issues'], offset))
+
+            module_scope.loads.update(summary['module_loads'])
+            for imp in _shift(summary['module_imports'], offset):
+                imp['scope'] = module_scope
+                module_imports.append(imp)
+
+        # Module-level imports may be used by any segment, so check them against the union of loads
+        unused_imports.extend(self.analyzer._find_unused_imports(module_imports))
+
+        analysis_results = self.analyzer.build_results(lines_of_code, stats, nested_depth, rule_issues,
+                                                       inefficient_patterns, unused_imports)
+        security_analysis = self.security_checker.build_results(pattern_security + ast_security)
+        if partial_reason is not None:
+            analysis_results['partial'] = True
+            analysis_results['partial_reason'] = partial_reason
+        return analysis_results, security_analysis
+
+def _root_scope(context) -> Optional[Scope]:
+    scope = context.current_scope
+    while scope is not None and scope.parent is not None:
+        scope = scope.parent
+    return scope
+
+def _shift(items: List[Dict[str, Any]], offset: int) -> List[Dict[str, Any]]:
+    """Copy issue dicts, moving segment-relative line numbers to file line numbers"""
+    shifted = []
+    for item in items:
+        item = dict(item)
+        item['line'] = item['line'] + offset
+        shifted.append(item)
+    return shifted
@@ -0,0 +1,112 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional
+
+class Profiler:
+    """Opt-in recorder of wall time, CPU time and counters for each stage of one analysis"""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    def _entry(self, name: str) -> Dict[str, float]:
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = {'wall_ms': 0.0, 'cpu_ms': 0.0, 'calls': 0}
+        return entry
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as one call of the named stage"""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield self
+        finally:
+            self.add_time(name, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+
+    def add_time(self, name: str, wall_seconds: float, cpu_seconds: float, calls: int = 1):
+        entry = self._entry(name)
+        entry['wall_ms'] += wall_seconds * 1000
+        entry['cpu_ms'] += cpu_seconds * 1000
+        entry['calls'] += calls
+
+    def count(self, name: str, counter: str, amount: int = 1):
+        """Increment a counter such as nodes_visited or lines_scanned on a stage"""
+        entry = self._entry(name)
+        entry[counter] = entry.get(counter, 0) + amount
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        """Snapshot of all stages, with times rounded to microseconds"""
+        return {
+            name: {key: round(value, 3) if isinstance(value, float) else value
+                   for key, value in entry.items()}
+            for name, entry in self.stages.items()
+        }
+
+def timed_stage(profiler: Optional[Profiler], name: str):
+    """Profiler.stage when instrumentation is enabled, otherwise a no-op context"""
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(name)
+
+class TimingHistograms:
+    """Aggregates stage timings from many analyses into log-scale wall-time histograms"""
+
+    # Bucket upper bounds in milliseconds
+    BUCKETS_MS = [0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500,
+                  1000, 2000, 5000, 10000, 30000, 60000]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, timings: Dict[str, Dict[str, float]]):
+        """Add one analysis' timing dict (as produced by Profiler.as_dict)"""
+        with self._lock:
+            for name, entry in timings.items():
+                histogram = self._histograms.get(name)
+                if histogram is None:
+                    histogram = self._histograms[name] = {
+                        'counts': [0] * (len(self.BUCKETS_MS) + 1),
+                        'count': 0, 'total_ms': 0.0, 'max_ms': 0.0
+                    }
+                wall_ms = entry.get('wall_ms', 0.0)
+                histogram['counts'][bisect.bisect_left(self.BUCKETS_MS, wall_ms)] += 1
+                histogram['count'] += 1
+                histogram['total_ms'] += wall_ms
+                histogram['max_ms'] = max(histogram['max_ms'], wall_ms)
+
+    def _percentile(self, counts: List[int], total: int, max_ms: float, fraction: float) -> float:
+        # Report the upper bound of the bucket containing the percentile
+        threshold = fraction * total
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= threshold and bucket_count:
+                return min(self.BUCKETS_MS[index], max_ms) if index < len(self.BUCKETS_MS) else max_ms
+        return max_ms
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage count, mean, approximate p50/p90/p99 and max wall time"""
+        with self._lock:
+            result = {}
+            for name, histogram in self._histograms.items():
+                count = histogram['count']
+                result[name] = {
+                    'count': count,
+                    'mean_ms': round(histogram['total_ms'] / count, 3) if count else 0.0,
+                    'p50_ms': self._percentile(histogram['counts'], count, histogram['max_ms'], 0.50),
+                    'p90_ms': self._percentile(histogram['counts'], count, histogram['max_ms'], 0.90),
+                    'p99_ms': self._percentile(histogram['counts'], count, histogram['max_ms'], 0.99),
+                    'max_ms': round(histogram['max_ms'], 3)
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+# Process-wide aggregate of every profiled analysis
+timing_histograms = TimingHistograms()
@@ -0,0 +1,103 @@
+from typing import Any, Dict, List, Optional
+
+class RuleInfo:
+    """Metadata shared by every finding of one kind, interned by rule id"""
+
+    __slots__ = ('rule_id', 'type', 'subtype', 'severity', 'description', 'suggestion')
+
+    def __init__(self, rule_id: str, type: str, description: str, suggestion: str,
+                 subtype: Optional[str] = None, severity: Optional[str] = None):
+        self.rule_id = rule_id
+        self.type = type
+        self.subtype = subtype
+        self.severity = severity
+        self.description = description  # May contain "{detail}", filled in per issue
+        self.suggestion = suggestion
+
+_rule_infos: Dict[str, RuleInfo] = {}
+
+def rule_info(rule_id: str, type: str, description: str, suggestion: str,
+              subtype: Optional[str] = None, severity: Optional[str] = None) -> RuleInfo:
+    """Get the interned RuleInfo for a rule id, creating it on first use"""
+    info = _rule_infos.get(rule_id)
+    if info is None:
+        info = _rule_infos[rule_id] = RuleInfo(rule_id, type, description, suggestion, subtype, severity)
+    return info
+
+def get_rule_info(rule_id: str) -> Optional[RuleInfo]:
+    return _rule_infos.get(rule_id)
+
+class Issue:
+    """A single finding: a line number plus a reference to its shared RuleInfo
+
+    Supports read-only dict-style access (issue['line'], issue.get('severity'))
+    so existing consumers work unchanged; to_dict() is only needed at JSON boundaries.
+    """
+
+    __slots__ = ('rule', 'line', 'detail', 'code_snippet')
+
+    # Keys in the order the dict form has always used
+    FIELDS = ('type', 'subtype', 'line', 'severity', 'description', 'suggestion', 'code_snippet')
+
+    def __init__(self, rule: RuleInfo, line: int, detail: Optional[str] = None,
+                 code_snippet: Optional[str] = None):
+        self.rule = rule
+        self.line = line
+        self.detail = detail
+        self.code_snippet = code_snippet
+
+    @property
+    def type(self) -> str:
+        return self.rule.type
+
+    @property
+    def description(self) -> str:
+        if self.detail is None:
+            return self.rule.description
+        return self.rule.description.format(detail=self.detail)
+
+    def _field(self, key: str) -> Any:
+        if key == 'line':
+            return self.line
+        if key == 'description':
+            return self.description
+        if key == 'code_snippet':
+            return self.code_snippet
+        if key in ('type', 'subtype', 'severity', 'suggestion'):
+            return getattr(self.rule, key)
+        return None
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._field(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._field(key)
+        return default if value is None else value
+
+    def __contains__(self, key: str) -> bool:
+        return self._field(key) is not None
+
+    def keys(self) -> List[str]:
+        return [key for key in self.FIELDS if self._field(key) is not None]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self._field(key) for key in self.keys()}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Issue):
+            other = other.to_dict()
+        return isinstance(other, dict) and self.to_dict() == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Issue({self.rule.rule_id!r}, line={self.line})"
+
+def to_jsonable(obj: Any) -> Any:
+    """json.dumps default hook that converts Issue records to plain dicts"""
+    if isinstance(obj, Issue):
+        return obj.to_dict()
+    return str(obj)
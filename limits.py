@@ -0,0 +1,49 @@
+import os
+from typing import Optional
+
+class InputTooLargeError(ValueError):
+    """Raised when code exceeds the configured size limits and is not analyzed at all"""
+    pass
+
+class AnalysisLimits:
+    """Size limits and time budget that keep one pathological input from monopolizing a worker"""
+
+    def __init__(self, max_bytes: Optional[int] = None, max_lines: Optional[int] = None,
+                 max_nodes: Optional[int] = None, time_budget_seconds: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.max_lines = max_lines
+        self.max_nodes = max_nodes
+        self.time_budget_seconds = time_budget_seconds
+
+    @classmethod
+    def from_env(cls) -> 'AnalysisLimits':
+        """Read limits from GREENCODE_MAX_* variables, falling back to defaults; 0 disables a limit"""
+        def read(name, default, cast):
+            value = cast(os.getenv(name, default))
+            return value if value > 0 else None
+
+        return cls(
+            max_bytes=read('GREENCODE_MAX_BYTES', 5 * 1024 * 1024, int),
+            max_lines=read('GREENCODE_MAX_LINES', 200000, int),
+            max_nodes=read('GREENCODE_MAX_NODES', 5000000, int),
+            time_budget_seconds=read('GREENCODE_TIME_BUDGET', 30.0, float)
+        )
+
+    def check_size(self, code: str, line_count: int):
+        """Raise InputTooLargeError if the code exceeds the byte or line limits"""
+        if self.max_bytes is not None:
+            size = len(code.encode('utf-8'))
+            if size > self.max_bytes:
+                raise InputTooLargeError(
+                    f"Code is {size:,} bytes, which exceeds the {self.max_bytes:,} byte limit"
+                )
+        if self.max_lines is not None and line_count > self.max_lines:
+            raise InputTooLargeError(
+                f"Code has {line_count:,} lines, which exceeds the {self.max_lines:,} line limit"
+            )
+
+DEFAULT_LIMITS = AnalysisLimits.from_env()
+
+# Reasons an analysis can stop early and return a partial result
+NODE_LIMIT_REACHED = 'node_limit'
+TIME_BUDGET_EXHAUSTED = 'time_budget'
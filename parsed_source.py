@@ -0,0 +1,128 @@
+import ast
+import hashlib
+import io
+import time
+import tokenize
+from typing import Any, Dict, List, Optional, Union
+from limits import DEFAULT_LIMITS, TIME_BUDGET_EXHAUSTED, AnalysisLimits
+
+class ParsedSource:
+    """Parses a code snippet once and shares the result across the analysis pipeline"""
+
+    def __init__(self, code: str, profiler=None, limits: Optional[AnalysisLimits] = None):
+        self.code = code
+        self.profiler = profiler  # Optional instrumentation.Profiler for this analysis
+        self.limits = limits or DEFAULT_LIMITS
+        self.deadline: Optional[float] = None
+        if self.limits.time_budget_seconds is not None:
+            self.deadline = time.perf_counter() + self.limits.time_budget_seconds
+        self.partial_reason: Optional[str] = None
+        self._content_hash = None
+        self.rule_contexts: Dict[Any, Any] = {}  # Rule registry -> traversal result
+        self._lines = None
+        self._tree = None
+        self._syntax_error = None
+        self._parsed = False
+        self._tokens = None
+        self._line_offsets = None
+
+    @classmethod
+    def ensure(cls, source: Union[str, 'ParsedSource']) -> 'ParsedSource':
+        """Return the given ParsedSource, or parse a raw code string"""
+        if isinstance(source, ParsedSource):
+            return source
+        return cls(source)
+
+    def _parse(self):
+        # Parsing is deferred so a cache hit on content_hash never pays for it
+        if not self._parsed:
+            if self.profiler is not None:
+                with self.profiler.stage('parse'):
+                    self._parse_tree()
+                self.profiler.count('parse', 'lines_scanned', len(self.lines))
+            else:
+                self._parse_tree()
+            self._parsed = True
+
+    def _parse_tree(self):
+        try:
+            self._tree = ast.parse(self.code)
+        except SyntaxError as e:
+            self._syntax_error = e
+        except (RecursionError, MemoryError):
+            self._syntax_error = SyntaxError("Code is too deeply nested to parse")
+
+    def check_limits(self):
+        """Raise InputTooLargeError if the code exceeds the configured byte or line limits"""
+        self.limits.check_size(self.code, len(self.lines))
+
+    def budget_exhausted(self) -> bool:
+        """Whether the time budget has run out, marking the analysis partial if so"""
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self.mark_partial(TIME_BUDGET_EXHAUSTED)
+            return True
+        return False
+
+    def mark_partial(self, reason: str):
+        """Record that some stage stopped early, so results must be flagged as partial"""
+        if self.partial_reason is None:
+            self.partial_reason = reason
+
+    @property
+    def tree(self) -> Optional[ast.AST]:
+        """Parsed AST, or None if the code has syntax errors"""
+        self._parse()
+        return self._tree
+
+    @property
+    def content_hash(self) -> str:
+        """SHA-256 of the code, computed on first access so oversized input is never hashed"""
+        if self._content_hash is None:
+            self._content_hash = hashlib.sha256(self.code.encode('utf-8')).hexdigest()
+        return self._content_hash
+
+    @property
+    def syntax_error(self) -> Optional[SyntaxError]:
+        """The error raised while parsing, if any"""
+        self._parse()
+        return self._syntax_error
+
+    @property
+    def is_valid(self) -> bool:
+        """Whether the code parsed without syntax errors"""
+        return self.tree is not None
+
+    @property
+    def lines(self) -> List[str]:
+        """Source split into lines, built lazily on first access"""
+        if self._lines is None:
+            self._lines = self.code.split('\n')
+        return self._lines
+
+    @property
+    def tokens(self) -> List[tokenize.TokenInfo]:
+        """Token stream of the code, built lazily on first access"""
+        if self._tokens is None:
+            try:
+                self._tokens = list(tokenize.generate_tokens(io.StringIO(self.code).readline))
+            except (tokenize.TokenError, SyntaxError):
+                self._tokens = []
+        return self._tokens
+
+    @property
+    def line_offsets(self) -> List[int]:
+        """Character offset at which each line starts, built lazily on first access"""
+        if self._line_offsets is None:
+            offsets = []
+            offset = 0
+            for line in self.lines:
+                offsets.append(offset)
+                offset += len(line) + 1
+            self._line_offsets = offsets
+        return self._line_offsets
+
+    def line(self, line_number: int) -> str:
+        """Get a source line by its 1-based line number"""
+        if 1 <= line_number <= len(self.lines):
+            return self.lines[line_number - 1]
+        return ""
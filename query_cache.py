@@ -0,0 +1,86 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Set
+
+class QueryCache:
+    """In-memory TTL + LRU cache for database reads, invalidated by tag
+
+    Each entry carries tags (e.g. a username) so a write can drop exactly the
+    entries it affects. Entries also expire ttl_seconds after they were loaded,
+    which bounds staleness for writes made by other processes. Hits return a deep
+    copy, so callers may modify results freely.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()  # key -> (expires_at, tags, value)
+        self._keys_by_tag: Dict[Hashable, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a load that raced with a write is not stored
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: Hashable, tags: Iterable[Hashable], load: Callable[[], Any]) -> Any:
+        """Return the cached value for key, or call load() and cache its result
+
+        Exceptions from load() propagate and nothing is cached.
+        """
+        if self.ttl_seconds <= 0:
+            return load()
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[2])
+            self.misses += 1
+            generation = self._generation
+
+        value = load()
+        tags = frozenset(tags)
+        with self._lock:
+            if generation != self._generation:
+                return value
+            self._discard(key)
+            self._entries[key] = (now + self.ttl_seconds, tags, copy.deepcopy(value))
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+        return value
+
+    def invalidate(self, *tags: Hashable):
+        """Drop every entry carrying any of the tags"""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def _discard(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[1]:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
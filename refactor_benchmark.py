@@ -0,0 +1,269 @@
+import ast
+import json
+import math
+import random
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Sequence
+from execution_profiler import MeasurementError, run_isolated
+from parsed_source import ParsedSource
+from refactor_transforms import apply_refactors
+
+# Executed by a fresh, isolated interpreter (see execution_profiler.run_isolated).
+# Checks that both versions return equal results for every input, then times them
+# in interleaved rounds so drift in machine load affects both versions equally.
+_RUNNER = r'''
+import contextlib, copy, io, json, sys, time, timeit, traceback
+
+job = json.loads(sys.stdin.read())
+result = {}
+captured = io.StringIO()
+
+def load(code, label):
+    namespace = {'__name__': '__benchmark__'}
+    exec(compile(code, f'<{label}>', 'exec'), namespace)
+    function = namespace.get(job['function'])
+    if not callable(function):
+        raise NameError(f"{label} code does not define a callable {job['function']!r}")
+    return function
+
+def call(function, args):
+    try:
+        return ('ok', function(*copy.deepcopy(args)))
+    except Exception as e:
+        return ('raised', type(e).__name__)
+
+try:
+    with contextlib.redirect_stdout(captured), contextlib.redirect_stderr(captured):
+        original = load(job['original'], 'original')
+        refactored = load(job['refactored'], 'refactored')
+
+        mismatches = []
+        for index, args in enumerate(job['inputs']):
+            expected, actual = call(original, args), call(refactored, args)
+            if expected != actual:
+                mismatches.append({'input_index': index, 'original': repr(expected)[:200],
+                                   'refactored': repr(actual)[:200]})
+        result['equivalent'] = not mismatches
+        result['mismatches'] = mismatches[:10]
+
+        if not mismatches:
+            inputs = job['inputs']
+            def run_all(function, batch):
+                for args in batch:
+                    function(*args)
+
+            def timed(function, rounds):
+                # Every round gets its own copy of the inputs, made before the clock starts,
+                # so a function that mutates its arguments cannot change later rounds' work
+                batches = iter([copy.deepcopy(inputs) for _ in range(rounds)])
+                return timeit.Timer(lambda: run_all(function, next(batches))).timeit(rounds)
+
+            functions = {'original': original, 'refactored': refactored}
+            # Warm up, then size each sample to take roughly min_sample_seconds
+            number = 1
+            for name, function in functions.items():
+                timed(function, job['warmup'])
+                rounds = 1
+                while True:
+                    elapsed = timed(function, rounds)
+                    if elapsed >= job['min_sample_seconds'] or rounds >= 10 ** 6:
+                        break
+                    rounds *= 10
+                number = max(number, int(rounds * job['min_sample_seconds'] / max(elapsed, 1e-9)) or 1)
+
+            samples = {name: [] for name in functions}
+            for _ in range(job['repeat']):
+                for name, function in functions.items():
+                    samples[name].append(timed(function, number) / number)
+            result['number'] = number
+            result['samples'] = samples
+except BaseException:
+    result['error'] = traceback.format_exc(limit=5)
+result['output'] = captured.getvalue()[-4000:]
+
+with open(sys.argv[1], 'w') as f:
+    json.dump(result, f)
+'''
+
+# Argument names that suggest what kind of value a function expects
+_COUNT_NAMES = {'n', 'count', 'size', 'length', 'limit', 'k', 'num', 'times', 'iterations'}
+_TEXT_NAMES = {'s', 'text', 'string', 'word', 'name', 'line', 'message', 'content'}
+
+def generate_inputs(code: str, function_name: str, size: int = 1000, cases: int = 3,
+                    seed: int = 0) -> List[List[Any]]:
+    """Generate representative argument lists for a function from its parameter names
+
+    Parameters are guessed to be sequences, counts or strings by name; anything
+    else receives a list of integers, the most common input for the loops the
+    refactor engine rewrites.
+    """
+    tree = ast.parse(code)
+    function = next((node for node in ast.walk(tree)
+                     if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == function_name),
+                    None)
+    if function is None:
+        raise ValueError(f"No function named {function_name!r} in the code")
+
+    params = [arg.arg for arg in function.args.posonlyargs + function.args.args]
+    required = len(params) - len(function.args.defaults)
+    if params and params[0] in ('self', 'cls'):
+        raise ValueError("Methods cannot be benchmarked directly; pass explicit inputs")
+
+    rng = random.Random(seed)
+    inputs = []
+    for case in range(cases):
+        # Vary the size so results do not depend on a single input shape
+        case_size = max(1, size * (case + 1) // cases)
+        args = []
+        for param in params[:required]:
+            name = param.lower()
+            if name in _COUNT_NAMES:
+                args.append(case_size)
+            elif name in _TEXT_NAMES:
+                args.append(''.join(rng.choice('abcdefghij ') for _ in range(case_size)))
+            else:
+                args.append([rng.randint(-1000, 1000) for _ in range(case_size)])
+        inputs.append(args)
+    return inputs
+
+def bootstrap_speedup_interval(original: List[float], refactored: List[float], confidence: float = 0.95,
+                               resamples: int = 2000, seed: int = 0) -> List[float]:
+    """Percentile bootstrap confidence interval for mean(original) / mean(refactored)"""
+    rng = random.Random(seed)
+    ratios = []
+    for _ in range(resamples):
+        original_mean = statistics.fmean(rng.choices(original, k=len(original)))
+        refactored_mean = statistics.fmean(rng.choices(refactored, k=len(refactored)))
+        ratios.append(original_mean / refactored_mean)
+    ratios.sort()
+    tail = (1 - confidence) / 2
+    low = ratios[int(tail * (resamples - 1))]
+    high = ratios[int((1 - tail) * (resamples - 1))]
+    return [low, high]
+
+class RefactorBenchmark:
+    """Validates a refactor by checking output equivalence and measuring speedup in a subprocess"""
+
+    def __init__(self, repeat: int = 15, warmup: int = 3, min_sample_seconds: float = 0.02,
+                 timeout: float = 120.0, confidence: float = 0.95):
+        self.repeat = repeat
+        self.warmup = warmup
+        self.min_sample_seconds = min_sample_seconds
+        self.timeout = timeout
+        self.confidence = confidence
+
+    def compare(self, original_code: str, refactored_code: str, function_name: str,
+                inputs: Optional[List[List[Any]]] = None) -> Dict[str, Any]:
+        """Benchmark function_name from both versions of the code
+
+        inputs is a list of argument lists; when omitted, inputs are generated from
+        the original function's signature. The verdict is 'faster' or 'slower' only
+        when the confidence interval for the speedup excludes 1.0, 'not_equivalent'
+        when any input produces a different result or exception, and otherwise
+        'inconclusive'.
+        """
+        if inputs is None:
+            inputs = generate_inputs(original_code, function_name)
+
+        job = json.dumps({
+            'original': original_code,
+            'refactored': refactored_code,
+            'function': function_name,
+            'inputs': inputs,
+            'repeat': self.repeat,
+            'warmup': self.warmup,
+            'min_sample_seconds': self.min_sample_seconds
+        })
+        measurement = run_isolated(_RUNNER, job, self.timeout)
+
+        if 'error' in measurement:
+            raise MeasurementError(f"Benchmark failed:\n{measurement['error']}")
+
+        report = {
+            'function': function_name,
+            'input_count': len(inputs),
+            'equivalent': measurement['equivalent'],
+            'mismatches': measurement['mismatches']
+        }
+        if not measurement['equivalent']:
+            report['verdict'] = 'not_equivalent'
+            return report
+
+        original = measurement['samples']['original']
+        refactored = measurement['samples']['refactored']
+        low, high = bootstrap_speedup_interval(original, refactored, self.confidence)
+
+        report.update({
+            'original_mean_s': statistics.fmean(original),
+            'refactored_mean_s': statistics.fmean(refactored),
+            'original_stdev_s': statistics.stdev(original) if len(original) > 1 else 0.0,
+            'refactored_stdev_s': statistics.stdev(refactored) if len(refactored) > 1 else 0.0,
+            'speedup': statistics.fmean(original) / statistics.fmean(refactored),
+            'speedup_interval': [low, high],
+            'confidence': self.confidence,
+            'calls_per_sample': measurement['number'],
+            'samples': len(original)
+        })
+        if low > 1.0:
+            report['verdict'] = 'faster'
+        elif high < 1.0:
+            report['verdict'] = 'slower'
+        else:
+            report['verdict'] = 'inconclusive'
+        return report
+
+# Snippets mixed at random by generate_refactor_fuzz_source; {n} keeps names unique
+_FUZZ_SNIPPETS = [
+    "def double_{n}(items):\n    result = []\n    i = 0\n    while i < len(items):\n"
+    "        result.append(items[i] * 2)\n        i += 1\n    return result\n",
+    "def show_{n}(data):\n    for i in range(len(data)):\n        print(i, data[i])\n",
+    "def odd_{n}(nums):\n    out = []\n    for x in nums:\n        if x % 2:\n            out.append(x)\n    return out\n",
+    # A while header with a long body and no increment: the shape that made the old
+    # DOTALL regexes with backreferences backtrack over the rest of the file
+    "i_{n} = 0\nwhile i_{n} < len(xs):\n" + "    y = i_{n} + 1  # i_{n} += 1 missing\n" * 20 + "    break\n",
+    "values_{n} = []\nfor v in range({n}):\n    values_{n}.append(v)\n    print(v)\n",
+    "total_{n} = sum(x * x for x in range({n}))\n",
+]
+
+def generate_refactor_fuzz_source(line_count: int, seed: int = 0) -> str:
+    """Generate valid Python of about line_count lines mixing rewritable, near-miss and adversarial loops"""
+    rng = random.Random(seed)
+    parts = ["xs = list(range(10))\n"]
+    lines = 1
+    n = 0
+    while lines < line_count:
+        snippet = rng.choice(_FUZZ_SNIPPETS).format(n=n)
+        parts.append(snippet)
+        lines += snippet.count('\n')
+        n += 1
+    return ''.join(parts)
+
+def measure_refactor_scaling(sizes: Sequence[int] = (2000, 4000, 8000, 16000, 32000),
+                             repeat: int = 3, seed: int = 0) -> Dict[str, Any]:
+    """Time apply_refactors on fuzzed inputs of growing size and fit the growth exponent
+
+    Parsing is excluded since the tree is shared with the analysis. The exponent is
+    the slope of log(time) against log(lines); 1.0 is linear, and anything above
+    1.25 is reported as non-linear.
+    """
+    rows = []
+    for size in sizes:
+        code = generate_refactor_fuzz_source(size, seed)
+        line_count = code.count('\n')
+        best = math.inf
+        for _ in range(repeat):
+            source = ParsedSource(code)
+            source.tree
+            start = time.perf_counter()
+            apply_refactors(source)
+            best = min(best, time.perf_counter() - start)
+        rows.append({'lines': line_count, 'seconds': round(best, 6),
+                     'us_per_line': round(best / line_count * 1e6, 3)})
+
+    xs = [math.log(row['lines']) for row in rows]
+    ys = [math.log(max(row['seconds'], 1e-9)) for row in rows]
+    x_mean, y_mean = statistics.fmean(xs), statistics.fmean(ys)
+    exponent = (sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys))
+                / sum((x - x_mean) ** 2 for x in xs))
+    return {'sizes': rows, 'exponent': round(exponent, 3), 'linear': exponent <= 1.25}
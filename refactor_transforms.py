@@ -0,0 +1,562 @@
+import ast
+import bisect
+import copy
+import tokenize
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
+from parsed_source import ParsedSource
+
+# Builtins the rewrites call; they are only used if the code never rebinds them
+REQUIRED_BUILTINS = ('len', 'range', 'enumerate')
+
+def _walk_all(nodes: Iterable[ast.AST]) -> Iterable[ast.AST]:
+    for node in nodes:
+        yield from ast.walk(node)
+
+def _count_name(nodes: Iterable[ast.AST], name: str) -> int:
+    return sum(1 for node in _walk_all(nodes) if isinstance(node, ast.Name) and node.id == name)
+
+def _is_name(node: ast.AST, name: Optional[str] = None) -> bool:
+    return isinstance(node, ast.Name) and (name is None or node.id == name)
+
+def _is_call_to(node: ast.AST, function: str, arg_count: int = 1) -> bool:
+    return (isinstance(node, ast.Call) and _is_name(node.func, function)
+            and len(node.args) == arg_count and not node.keywords
+            and not any(isinstance(arg, ast.Starred) for arg in node.args))
+
+def _stores_name(nodes: Iterable[ast.AST], name: str) -> bool:
+    return any(isinstance(node, ast.Name) and node.id == name and not isinstance(node.ctx, ast.Load)
+               for node in _walk_all(nodes))
+
+def _has_own_continue(nodes: List[ast.stmt]) -> bool:
+    """Whether a continue statement belongs to the loop whose body is nodes"""
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Continue):
+            return True
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.While)):
+            stack.extend(node.orelse)  # continue in the else clause belongs to the outer loop
+            continue
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            continue
+        stack.extend(ast.iter_child_nodes(node))
+    return False
+
+def _only_subscripted(nodes: List[ast.AST], collection: str) -> bool:
+    """Whether every reference to collection in nodes is a read such as collection[...]"""
+    subscripted = set()
+    for node in _walk_all(nodes):
+        if isinstance(node, ast.Subscript) and _is_name(node.value, collection):
+            if not isinstance(node.ctx, ast.Load):
+                return False
+            subscripted.add(id(node.value))
+    return all(id(node) in subscripted for node in _walk_all(nodes) if _is_name(node, collection))
+
+class _IndexReplacer(ast.NodeTransformer):
+    """Replaces collection[index] reads with the loop's element variable"""
+
+    def __init__(self, collection: str, index: str, element: str):
+        self.collection = collection
+        self.index = index
+        self.element = element
+        self.replaced = 0
+
+    def visit_Subscript(self, node):
+        self.generic_visit(node)
+        if (_is_name(node.value, self.collection) and _is_name(node.slice, self.index)
+                and isinstance(node.ctx, ast.Load)):
+            self.replaced += 1
+            return ast.copy_location(ast.Name(self.element, ast.Load()), node)
+        return node
+
+class _Entry:
+    """A statement in a block being rewritten, with the original source span it replaces"""
+
+    __slots__ = ('node', 'start', 'start_col', 'end', 'end_col', 'changed', 'applied')
+
+    def __init__(self, node: ast.stmt):
+        self.node = node
+        self.start, self.start_col = node.lineno, node.col_offset
+        self.end, self.end_col = node.end_lineno, node.end_col_offset
+        self.changed = False
+        self.applied: List[Dict[str, Any]] = []
+
+class GreenRefactorTransformer(ast.NodeTransformer):
+    """Rewrites loops into faster idioms: while→for, range(len)→enumerate, append loop→comprehension
+
+    Each rewrite is applied only when static checks show it preserves behavior:
+    the index and loop variables must not be used outside the loop, the collection
+    must only be read by subscript inside the loop, and the builtins involved must
+    not be rebound anywhere in the module. range(len)→enumerate is only applied to
+    collections provably a list or tuple (every binding in the scope is a list or
+    tuple display or comprehension), since on a dict it would iterate keys instead
+    of indexing. Append loops inside a try or with block are left alone, because a
+    handler could observe the partly built list that a comprehension never leaves.
+    Like any static rewrite, it assumes the collection is not mutated through
+    aliases inside the loop.
+
+    Rewritten statements are collected in `replacements` so the caller can splice
+    them into the original text; `applied` lists every rewrite made.
+    """
+
+    SCOPE_TYPES = (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef)
+    # Blocks whose handlers or context managers can see the state left by a statement that raises
+    GUARD_TYPES = (ast.Try, ast.TryStar, ast.With, ast.AsyncWith)
+    # Values that are certainly a list or tuple
+    SEQUENCE_DISPLAYS = (ast.List, ast.ListComp, ast.Tuple)
+    # Fields holding nested statements; only statement lists are rewritten, so expressions are never visited
+    BLOCK_FIELDS = ('body', 'orelse', 'finalbody', 'handlers', 'cases')
+
+    def __init__(self, tree: ast.AST):
+        self.used_names: Set[str] = set()
+        self.rebound_names: Set[str] = set()
+        # Name reference counts per function, including nested functions since they may close over its variables
+        self._scope_totals: Dict[int, Counter] = {}
+        # Names each scope binds only to list or tuple displays
+        self._scope_sequences: Dict[int, Set[str]] = {}
+        self._collect_names(tree)
+        self.enabled = not any(name in self.rebound_names for name in REQUIRED_BUILTINS)
+        self.replacements: List[_Entry] = []
+        self.applied: List[Dict[str, Any]] = []
+        self._scope_counts: List[Counter] = []  # Totals of each enclosing scope, innermost last
+        self._sequence_names: List[Set[str]] = []  # Provable list/tuple names of each enclosing scope
+        self._guard_depths: List[int] = []  # try/with blocks open in each enclosing scope
+        self._name_suffixes: Dict[str, int] = {}
+
+    def _collect_names(self, tree: ast.AST):
+        own = {id(tree): Counter()}
+        bindings = defaultdict(Counter)
+        sequence_bindings = defaultdict(Counter)
+        # Names declared global or nonlocal can be rebound from another scope
+        shared_names = set()
+        nested = defaultdict(list)
+        order = [id(tree)]
+        stack = [(tree, id(tree))]
+
+        while stack:
+            node, scope = stack.pop()
+            if isinstance(node, ast.Name):
+                own[scope][node.id] += 1
+                self.used_names.add(node.id)
+                if not isinstance(node.ctx, ast.Load):
+                    self.rebound_names.add(node.id)
+                    bindings[scope][node.id] += 1
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                self.used_names.add(node.name)
+                self.rebound_names.add(node.name)
+                bindings[scope][node.name] += 1
+            elif isinstance(node, ast.arg):
+                self.used_names.add(node.arg)
+                self.rebound_names.add(node.arg)
+                bindings[scope][node.arg] += 1
+            elif isinstance(node, ast.alias):
+                bound = node.asname or node.name.split('.')[0]
+                self.used_names.add(bound)
+                self.rebound_names.add(bound)
+                bindings[scope][bound] += 1
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                shared_names.update(node.names)
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+                if isinstance(node.value, self.SEQUENCE_DISPLAYS):
+                    targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                    for target in targets:
+                        if isinstance(target, ast.Name):
+                            sequence_bindings[scope][target.id] += 1
+            elif isinstance(node, ast.AugAssign):
+                # list += iterable and tuple += tuple keep the type
+                if isinstance(node.target, ast.Name):
+                    sequence_bindings[scope][node.target.id] += 1
+            elif isinstance(node, (ast.ExceptHandler, ast.MatchAs, ast.MatchStar, ast.MatchMapping)):
+                # Except clauses and match patterns bind plain strings, not Name nodes
+                name = node.rest if isinstance(node, ast.MatchMapping) else node.name
+                if name:
+                    bindings[scope][name] += 1
+
+            if isinstance(node, self.SCOPE_TYPES) and node is not tree:
+                nested[scope].append(id(node))
+                scope = id(node)
+                own[scope] = Counter()
+                order.append(scope)
+            stack.extend((child, scope) for child in ast.iter_child_nodes(node))
+
+        for scope in order:
+            self._scope_sequences[scope] = {name for name, count in bindings[scope].items()
+                                            if count == sequence_bindings[scope][name]} - shared_names
+
+        # Scopes are discovered parents first, so folding in reverse adds each nested total once
+        for scope in reversed(order):
+            totals = own[scope]
+            for child in nested[scope]:
+                totals.update(self._scope_totals[child])
+            self._scope_totals[scope] = totals
+
+    @property
+    def name_counts(self) -> Counter:
+        return self._scope_counts[-1]
+
+    def _adjust(self, name: str, delta: int):
+        for counts in self._scope_counts:
+            counts[name] += delta
+
+    def generic_visit(self, node):
+        # The tree may be shared with other analyses, so it is never modified: a node
+        # whose nested blocks changed is replaced by a shallow copy holding the new blocks
+        is_scope = isinstance(node, self.SCOPE_TYPES)
+        if is_scope:
+            self._scope_counts.append(self._scope_totals[id(node)])
+            self._sequence_names.append(self._scope_sequences[id(node)])
+            self._guard_depths.append(0)
+        is_guard = isinstance(node, self.GUARD_TYPES)
+        if is_guard:
+            self._guard_depths[-1] += 1
+        try:
+            updates = {}
+            for field in self.BLOCK_FIELDS:
+                children = getattr(node, field, None)
+                if not isinstance(children, list) or not children:
+                    continue
+                new_children = [self.visit(child) for child in children]
+                if isinstance(children[0], ast.stmt):
+                    # Comprehensions cannot see names defined in an enclosing class body
+                    new_children = self._rewrite_block(new_children, in_class=isinstance(node, ast.ClassDef))
+                if len(new_children) != len(children) or any(new is not old for new, old in zip(new_children, children)):
+                    updates[field] = new_children
+
+            if updates:
+                node = copy.copy(node)
+                for field, value in updates.items():
+                    setattr(node, field, value)
+            return node
+        finally:
+            if is_guard:
+                self._guard_depths[-1] -= 1
+            if is_scope:
+                self._scope_counts.pop()
+                self._sequence_names.pop()
+                self._guard_depths.pop()
+
+    def _rewrite_block(self, statements: List[ast.stmt], in_class: bool) -> List[ast.stmt]:
+        entries: List[_Entry] = []
+        for statement in statements:
+            entries.append(_Entry(statement))
+            self._reduce(entries, in_class)
+
+        for entry in entries:
+            if entry.changed:
+                ast.fix_missing_locations(entry.node)
+                self.replacements.append(entry)
+                self.applied.extend(entry.applied)
+        return [entry.node for entry in entries]
+
+    def _reduce(self, entries: List[_Entry], in_class: bool):
+        """Rewrite the tail of the block as far as possible after a statement is added"""
+        while True:
+            last = entries[-1]
+            rewritten = self._range_len_to_enumerate(last.node)
+            if rewritten is not None:
+                last.applied.append({'type': 'range_len_to_enumerate', 'line': last.node.lineno})
+                last.node, last.changed = rewritten, True
+
+            if len(entries) < 2:
+                return
+            previous = entries[-2]
+
+            rewritten = self._while_to_for(previous.node, last.node)
+            kind = 'while_to_for'
+            if rewritten is None and not in_class:
+                rewritten = self._append_to_comprehension(previous.node, last.node)
+                kind = 'list_append_to_comprehension'
+            if rewritten is None:
+                return
+
+            previous.applied.extend(last.applied)
+            previous.applied.append({'type': kind, 'line': last.node.lineno})
+            previous.node = rewritten
+            previous.end, previous.end_col = last.end, last.end_col
+            previous.changed = True
+            entries.pop()
+
+    def _element_name(self, collection: str) -> str:
+        if collection.endswith('s') and not collection.endswith('ss') and len(collection) > 2:
+            candidates = [collection[:-1], f"{collection[:-1]}_item"]
+        else:
+            candidates = ['item', f"{collection}_item"]
+        candidates = [name for name in candidates if name not in self.used_names]
+        name = candidates[0] if candidates else None
+        # Resume numbering where the last call for this collection stopped
+        suffix = self._name_suffixes.get(collection, 1)
+        while name is None or name in self.used_names:
+            name = f"{collection}_item_{suffix}"
+            suffix += 1
+        self._name_suffixes[collection] = suffix
+        self.used_names.add(name)
+        return name
+
+    def _while_to_for(self, init: ast.stmt, loop: ast.stmt) -> Optional[ast.For]:
+        """i = 0; while i < len(xs): ...; i += 1  →  for i in range(len(xs)): ..."""
+        if not (isinstance(init, ast.Assign) and len(init.targets) == 1 and _is_name(init.targets[0])
+                and isinstance(init.value, ast.Constant) and type(init.value.value) is int
+                and init.value.value == 0):
+            return None
+        index = init.targets[0].id
+
+        if not isinstance(loop, ast.While) or loop.orelse or len(loop.body) < 2:
+            return None
+        test = loop.test
+        if not (isinstance(test, ast.Compare) and _is_name(test.left, index) and len(test.ops) == 1
+                and isinstance(test.ops[0], ast.Lt) and _is_call_to(test.comparators[0], 'len')
+                and _is_name(test.comparators[0].args[0])):
+            return None
+        collection = test.comparators[0].args[0].id
+        if collection == index:
+            return None
+
+        step = loop.body[-1]
+        if not (isinstance(step, ast.AugAssign) and _is_name(step.target, index) and isinstance(step.op, ast.Add)
+                and isinstance(step.value, ast.Constant) and type(step.value.value) is int
+                and step.value.value == 1):
+            return None
+        body = loop.body[:-1]
+
+        # The index must only be read in the body and must not be used after the loop,
+        # where a while loop would leave it one higher than a for loop does
+        if _stores_name(body, index) or _has_own_continue(body):
+            return None
+        if _count_name([init, loop], index) != self.name_counts[index]:
+            return None
+        # len() is re-evaluated on every iteration of the while loop, so the collection must not change
+        if _stores_name(body, collection) or not _only_subscripted(body, collection):
+            return None
+
+        self._adjust(index, -2)
+        self._adjust('range', 1)
+        return ast.For(
+            target=ast.Name(index, ast.Store()),
+            iter=ast.Call(ast.Name('range', ast.Load()),
+                          [ast.Call(ast.Name('len', ast.Load()), [ast.Name(collection, ast.Load())], [])], []),
+            body=body, orelse=[], lineno=loop.lineno, col_offset=loop.col_offset
+        )
+
+    def _range_len_to_enumerate(self, loop: ast.stmt) -> Optional[ast.For]:
+        """for i in range(len(xs)): ... xs[i] ...  →  for i, x in enumerate(xs): ... x ..."""
+        if not (isinstance(loop, ast.For) and _is_name(loop.target) and _is_call_to(loop.iter, 'range')
+                and _is_call_to(loop.iter.args[0], 'len') and _is_name(loop.iter.args[0].args[0])):
+            return None
+        index = loop.target.id
+        collection = loop.iter.args[0].args[0].id
+        if collection == index:
+            return None
+        # Iterating a dict or other mapping yields keys, not the values d[i] would read
+        if collection not in self._sequence_names[-1]:
+            return None
+
+        if _stores_name(loop.body, index) or _stores_name(loop.body, collection):
+            return None
+        if not _only_subscripted(loop.body, collection):
+            return None
+        if not any(isinstance(node, ast.Subscript) and _is_name(node.value, collection) and _is_name(node.slice, index)
+                   for node in _walk_all(loop.body)):
+            return None
+
+        element = self._element_name(collection)
+        replacer = _IndexReplacer(collection, index, element)
+        body = [replacer.visit(copy.deepcopy(statement)) for statement in loop.body]
+
+        self._adjust(index, -replacer.replaced)
+        self._adjust(collection, -replacer.replaced)
+        self._adjust('range', -1)
+        self._adjust('len', -1)
+        self._adjust(element, replacer.replaced + 1)
+
+        iterable = ast.Name(collection, ast.Load())
+        if self.name_counts[index] == 1:
+            # Only the loop target is left, so the index is not needed at all
+            self._adjust(index, -1)
+            target = ast.Name(element, ast.Store())
+        else:
+            self._adjust('enumerate', 1)
+            target = ast.Tuple([ast.Name(index, ast.Store()), ast.Name(element, ast.Store())], ast.Store())
+            iterable = ast.Call(ast.Name('enumerate', ast.Load()), [iterable], [])
+
+        return ast.copy_location(ast.For(target=target, iter=iterable, body=body, orelse=loop.orelse), loop)
+
+    def _append_to_comprehension(self, init: ast.stmt, loop: ast.stmt) -> Optional[ast.Assign]:
+        """result = []; for x in xs: [if cond:] result.append(expr)  →  result = [expr for x in xs [if cond]]"""
+        if not (isinstance(init, ast.Assign) and len(init.targets) == 1 and _is_name(init.targets[0])
+                and isinstance(init.value, ast.List) and not init.value.elts):
+            return None
+        result = init.targets[0].id
+        # If the loop raises, the comprehension leaves the old value where the loop left a partial list
+        if self._guard_depths[-1]:
+            return None
+
+        if not isinstance(loop, ast.For) or loop.orelse or len(loop.body) != 1:
+            return None
+        statement = loop.body[0]
+        condition = None
+        if isinstance(statement, ast.If) and not statement.orelse and len(statement.body) == 1:
+            condition = statement.test
+            statement = statement.body[0]
+        if not (isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Call)
+                and isinstance(statement.value.func, ast.Attribute) and statement.value.func.attr == 'append'
+                and _is_name(statement.value.func.value, result) and len(statement.value.args) == 1
+                and not statement.value.keywords and not isinstance(statement.value.args[0], ast.Starred)):
+            return None
+        expression = statement.value.args[0]
+
+        parts = [loop.target, loop.iter, expression] + ([condition] if condition is not None else [])
+        if _count_name(parts, result):
+            return None
+        if any(isinstance(node, (ast.NamedExpr, ast.Yield, ast.YieldFrom, ast.Await)) for node in _walk_all(parts)):
+            return None
+
+        # A comprehension does not leak its loop variables, so they must not be used after the loop
+        targets = [node for node in ast.walk(loop.target) if isinstance(node, (ast.Name, ast.Starred))]
+        if not all(isinstance(node, ast.Starred) or isinstance(node.ctx, ast.Store) for node in targets):
+            return None
+        for node in targets:
+            if isinstance(node, ast.Name) and _count_name([loop], node.id) != self.name_counts[node.id]:
+                return None
+
+        self._adjust(result, -1)
+        comprehension = ast.comprehension(target=loop.target, iter=loop.iter,
+                                          ifs=[condition] if condition is not None else [], is_async=0)
+        return ast.copy_location(ast.Assign(targets=[ast.Name(result, ast.Store())],
+                                            value=ast.ListComp(elt=expression, generators=[comprehension])), init)
+
+def _is_while_len_loop(node: ast.stmt) -> bool:
+    test = getattr(node, 'test', None)
+    return (isinstance(node, ast.While) and isinstance(test, ast.Compare) and _is_name(test.left)
+            and len(test.ops) == 1 and isinstance(test.ops[0], ast.Lt) and _is_call_to(test.comparators[0], 'len'))
+
+def _is_range_len_loop(node: ast.stmt) -> bool:
+    return (isinstance(node, ast.For) and _is_call_to(node.iter, 'range')
+            and _is_call_to(node.iter.args[0], 'len'))
+
+def _is_empty_list_assign(node: ast.stmt) -> bool:
+    return (isinstance(node, ast.Assign) and len(node.targets) == 1 and _is_name(node.targets[0])
+            and isinstance(node.value, ast.List) and not node.value.elts)
+
+def find_refactor_sites(tree: ast.AST) -> List[Dict[str, Any]]:
+    """Find statements whose shape matches a rewrite, without checking whether it is safe
+
+    Only statement lists are visited and each statement is compared against its
+    successor with constant-size structural checks, so matching takes time
+    linear in the number of statements no matter how the code is crafted.
+    """
+    sites = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        for field in GreenRefactorTransformer.BLOCK_FIELDS:
+            children = getattr(node, field, None)
+            if not isinstance(children, list):
+                continue
+            stack.extend(children)
+            for index, statement in enumerate(children):
+                if _is_range_len_loop(statement):
+                    sites.append({'type': 'range_len_to_enumerate', 'line': statement.lineno})
+                if index == 0:
+                    continue
+                previous = children[index - 1]
+                if _is_while_len_loop(statement) and isinstance(previous, ast.Assign):
+                    sites.append({'type': 'while_to_for', 'line': statement.lineno})
+                elif isinstance(statement, ast.For) and _is_empty_list_assign(previous):
+                    sites.append({'type': 'list_append_to_comprehension', 'line': statement.lineno})
+    sites.sort(key=lambda site: site['line'])
+    return sites
+
+def apply_refactors(code: Union[str, ParsedSource]) -> Dict[str, Any]:
+    """Apply every safe rewrite to code, splicing the new statements into the original text
+
+    Works on the shared syntax tree of a ParsedSource without modifying it. Only
+    the rewritten statements are regenerated (with ast.unparse); the rest of the
+    file, including comments and formatting, is left untouched; statements with
+    comments inside them are not rewritten. Returns the new code, whether it
+    changed, and the list of applied rewrites. Code too deeply nested to rewrite
+    is returned unchanged.
+    """
+    source = ParsedSource.ensure(code)
+    unchanged = {'code': source.code, 'changed': False, 'applied': []}
+    if not source.is_valid or not find_refactor_sites(source.tree):
+        return unchanged
+    try:
+        return _rewrite(source) or unchanged
+    except RecursionError:
+        return unchanged
+
+def _rewrite(source: ParsedSource) -> Optional[Dict[str, Any]]:
+    """apply_refactors' rewrite and splice, or None if nothing could be changed"""
+    code = source.code
+    tree = source.tree
+    transformer = GreenRefactorTransformer(tree)
+    if transformer.enabled:
+        transformer.visit(tree)
+
+    lines = code.splitlines(keepends=True)
+    # Sorted (line, column) positions of every comment, to keep rewrites from dropping them
+    comments = [token.start for token in source.tokens if token.type == tokenize.COMMENT]
+    kept: List[_Entry] = []
+    applied: List[Dict[str, Any]] = []
+
+    # Outer rewrites already contain any rewrites nested inside them
+    for entry in sorted(transformer.replacements, key=lambda entry: (entry.start, -entry.end)):
+        if kept and entry.end <= kept[-1].end:
+            applied.extend(entry.applied)
+            continue
+        if _can_splice(lines, entry) and not _has_inner_comment(comments, entry):
+            kept.append(entry)
+            applied.extend(entry.applied)
+
+    if not kept:
+        return None
+
+    # Build the output in one pass; replacing list slices per rewrite would be quadratic
+    chunks = []
+    position = 0
+    for entry in kept:
+        first_line = lines[entry.start - 1]
+        last_line = lines[entry.end - 1]
+        indent = first_line[:entry.start_col]
+        trailing = last_line[entry.end_col:].strip()
+        newline = '\r\n' if last_line.endswith('\r\n') else '\n'
+
+        new_lines = [indent + line for line in ast.unparse(entry.node).split('\n')]
+        if trailing:
+            new_lines[-1] += '  ' + trailing
+        chunks.extend(lines[position:entry.start - 1])
+        chunks.extend(line + newline for line in new_lines)
+        position = entry.end
+    chunks.extend(lines[position:])
+
+    new_code = ''.join(chunks)
+    if not code.endswith(('\n', '\r')):
+        new_code = new_code.rstrip('\r\n')
+
+    try:
+        ast.parse(new_code)
+    except SyntaxError:
+        return None
+
+    applied.sort(key=lambda record: record['line'])
+    return {'code': new_code, 'changed': True, 'applied': applied}
+
+def _has_inner_comment(comments: List[tuple], entry: _Entry) -> bool:
+    """Whether a comment falls inside the statement's span, where regenerating it would drop the comment
+
+    A comment after the statement on its last line is kept by the splice.
+    """
+    index = bisect.bisect_left(comments, (entry.start, 0))
+    return index < len(comments) and comments[index] < (entry.end, entry.end_col)
+
+def _can_splice(lines: List[str], entry: _Entry) -> bool:
+    """Whether the rewritten statements occupy whole lines that can be replaced cleanly"""
+    if lines[entry.start - 1][:entry.start_col].strip():
+        return False
+    trailing = lines[entry.end - 1][entry.end_col:].strip()
+    if trailing and not trailing.startswith('#'):
+        return False
+    # Re-indenting would change the contents of multi-line string literals
+    text = ast.unparse(entry.node)
+    return '"""' not in text and "'''" not in text
@@ -0,0 +1,91 @@
+import gzip
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List
+from issues import to_jsonable
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+ARCHIVE_FORMATS = ('jsonl', 'parquet')
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return to_jsonable(value)
+
+class JsonlArchiveWriter:
+    """Appends rows to a gzip-compressed JSON Lines file, one gzip member per batch
+
+    Each batch is flushed and fsynced before write_batch returns, so rows are on
+    disk before the caller deletes them. A crash can only truncate the batch
+    being written, whose rows have not been deleted yet.
+    """
+
+    extension = '.jsonl.gz'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'ab')
+
+    def write_batch(self, rows: List[Dict[str, Any]]):
+        lines = ''.join(json.dumps(row, default=_jsonable) + '\n' for row in rows)
+        self._file.write(gzip.compress(lines.encode('utf-8')))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def size_bytes(self) -> int:
+        return os.path.getsize(self.path)
+
+    def close(self):
+        self._file.close()
+
+class ParquetArchiveWriter:
+    """Writes each batch to its own zstd-compressed Parquet file in a directory
+
+    A Parquet file is only readable once closed, so every batch gets a complete
+    part file before its rows are deleted. Dict and list values (the stored
+    analysis JSON) are kept as JSON text.
+    """
+
+    extension = ''
+
+    def __init__(self, path: str):
+        if not PARQUET_AVAILABLE:
+            raise ValueError("Parquet archives require pyarrow; install it or use the jsonl format")
+        self.path = path
+        self._parts = 0
+        self._bytes = 0
+        os.makedirs(path, exist_ok=True)
+
+    def write_batch(self, rows: List[Dict[str, Any]]):
+        rows = [{key: json.dumps(value, default=_jsonable) if isinstance(value, (dict, list)) else value
+                 for key, value in row.items()} for row in rows]
+        self._parts += 1
+        part_path = os.path.join(self.path, f"part-{self._parts:05d}.parquet")
+        pyarrow.parquet.write_table(pyarrow.Table.from_pylist(rows), part_path, compression='zstd')
+        with open(part_path, 'rb') as f:
+            os.fsync(f.fileno())
+        self._bytes += os.path.getsize(part_path)
+
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def close(self):
+        pass
+
+def open_archive(archive_dir: str, table_name: str, cutoff: datetime, archive_format: str = 'jsonl'):
+    """Create a new archive file in archive_dir named after the table, cutoff and current time"""
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unknown archive format {archive_format!r}; expected one of {', '.join(ARCHIVE_FORMATS)}")
+    writer_class = JsonlArchiveWriter if archive_format == 'jsonl' else ParquetArchiveWriter
+
+    os.makedirs(archive_dir, exist_ok=True)
+    name = (f"{table_name}-before-{cutoff:%Y%m%d}-archived-{datetime.utcnow():%Y%m%dT%H%M%S}"
+            f"{writer_class.extension}")
+    return writer_class(os.path.join(archive_dir, name))
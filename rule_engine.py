@@ -0,0 +1,185 @@
+import ast
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
+from limits import NODE_LIMIT_REACHED, TIME_BUDGET_EXHAUSTED
+
+class Scope:
+    """A lexical scope with the names loaded in it, or in a nested scope without resolving there"""
+
+    def __init__(self, node: ast.AST, parent: Optional['Scope'] = None):
+        self.node = node
+        self.parent = parent
+        self.loads: Set[str] = set()
+        self.bindings: Set[str] = set()
+        self.declared_outer: Set[str] = set()  # Names declared global or nonlocal
+        self.nested_loads: Set[str] = set()  # Loads passed up from nested scopes
+
+    def free_loads(self) -> Set[str]:
+        """Loads that resolve to an enclosing scope rather than to a binding in this one"""
+        local = self.bindings - self.declared_outer
+        escaping = self.loads - local
+        if isinstance(self.node, ast.ClassDef):
+            # Methods cannot see class-level names, so loads from nested scopes pass straight through
+            escaping |= self.nested_loads
+        return escaping
+
+class AnalysisContext:
+    """Mutable state shared by all rules during a single AST traversal"""
+
+    def __init__(self):
+        self.stats: Dict[str, int] = defaultdict(int)
+        self.issues: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.imports: List[Dict[str, Any]] = []
+        self.current_depth = 0
+        self.nested_depth = 0
+        self.current_scope: Optional[Scope] = None
+        self.nodes_visited = 0
+        self.partial_reason: Optional[str] = None  # Set when the traversal stopped early
+
+    def add_issue(self, category: str, issue: Dict[str, Any]):
+        """Record an issue under the given rule category"""
+        self.issues[category].append(issue)
+
+    def enter_block(self):
+        self.current_depth += 1
+        self.nested_depth = max(self.nested_depth, self.current_depth)
+
+    def exit_block(self):
+        self.current_depth -= 1
+
+    def enter_scope(self, node: ast.AST):
+        self.current_scope = Scope(node, self.current_scope)
+
+    def exit_scope(self):
+        scope = self.current_scope
+        if scope.parent is not None:
+            # Names a nested scope reads but does not bind itself count as used in the enclosing one
+            free_loads = scope.free_loads()
+            scope.parent.loads.update(free_loads)
+            scope.parent.nested_loads.update(free_loads)
+            self.current_scope = scope.parent
+
+    def record_load(self, name: str):
+        """Record that a name is read in the current scope"""
+        if self.current_scope is not None:
+            self.current_scope.loads.add(name)
+
+    def record_binding(self, name: str, scope: Optional[Scope] = None):
+        """Record that a name is assigned, imported or defined in scope (default: the current scope)"""
+        scope = scope or self.current_scope
+        if scope is not None:
+            scope.bindings.add(name)
+
+    def record_outer_declaration(self, names: List[str]):
+        """Record a global or nonlocal statement, whose names resolve outside the current scope"""
+        if self.current_scope is not None:
+            self.current_scope.declared_outer.update(names)
+
+class Rule:
+    """Base class for rules dispatched only the AST node types they subscribe to"""
+
+    rule_id: str = ''
+    category: str = 'efficiency'
+    node_types: Tuple[Type[ast.AST], ...] = ()
+
+    def visit(self, node: ast.AST, context: AnalysisContext):
+        """Called when a subscribed node is entered"""
+        pass
+
+    def leave(self, node: ast.AST, context: AnalysisContext):
+        """Called after all children of a subscribed node have been visited"""
+        pass
+
+class RuleRegistry:
+    """Holds rules and runs them over a tree in a single traversal"""
+
+    def __init__(self):
+        self.rules: List[Rule] = []
+        self._visitors: Dict[Type[ast.AST], List[Rule]] = defaultdict(list)
+        self._leavers: Dict[Type[ast.AST], List[Rule]] = defaultdict(list)
+
+    def register(self, rule: Rule) -> Rule:
+        """Register a rule for each of the node types it declares"""
+        self.rules.append(rule)
+        overrides_leave = type(rule).leave is not Rule.leave
+
+        for node_type in rule.node_types:
+            self._visitors[node_type].append(rule)
+            if overrides_leave:
+                self._leavers[node_type].insert(0, rule)
+
+        return rule
+
+    def run(self, tree: ast.AST, context: AnalysisContext, profiler=None,
+            max_nodes: Optional[int] = None, deadline: Optional[float] = None) -> AnalysisContext:
+        """Traverse the tree once, sending each node to its subscribed rules
+
+        Stops early, setting context.partial_reason, once max_nodes nodes have been
+        visited or time.perf_counter() passes deadline.
+        """
+        if profiler is None:
+            self._walk(tree, context, None, max_nodes, deadline)
+            return context
+
+        rule_times: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0.0, 0])
+        with profiler.stage('rules'):
+            self._walk(tree, context, rule_times, max_nodes, deadline)
+
+        profiler.count('rules', 'nodes_visited', context.nodes_visited)
+        for rule_id, (wall, cpu, calls) in rule_times.items():
+            profiler.add_time(f"rule.{rule_id}", wall, cpu, calls)
+        return context
+
+    def _walk(self, tree: ast.AST, context: AnalysisContext, rule_times: Optional[Dict[str, List[float]]],
+              max_nodes: Optional[int], deadline: Optional[float]):
+        # Iterative pre-order walk with an explicit stack, so deeply nested code cannot
+        # overflow the interpreter stack; (node, True) entries fire the leave callbacks
+        visitors = self._visitors
+        leavers = self._leavers
+        stack = [(tree, False)]
+        nodes_visited = 0
+
+        while stack:
+            node, leaving = stack.pop()
+            node_type = type(node)
+
+            if leaving:
+                for rule in leavers[node_type]:
+                    self._call(rule.leave, rule.rule_id, node, context, rule_times)
+                continue
+
+            nodes_visited += 1
+            if max_nodes is not None and nodes_visited > max_nodes:
+                context.partial_reason = NODE_LIMIT_REACHED
+                break
+            if deadline is not None and not nodes_visited & 1023 and time.perf_counter() > deadline:
+                context.partial_reason = TIME_BUDGET_EXHAUSTED
+                break
+
+            for rule in visitors.get(node_type, ()):
+                self._call(rule.visit, rule.rule_id, node, context, rule_times)
+
+            if node_type in leavers:
+                stack.append((node, True))
+
+            children = list(ast.iter_child_nodes(node))
+            for child in reversed(children):
+                stack.append((child, False))
+
+        context.nodes_visited = nodes_visited
+
+    @staticmethod
+    def _call(method, rule_id: str, node: ast.AST, context: AnalysisContext,
+              rule_times: Optional[Dict[str, List[float]]]):
+        if rule_times is None:
+            method(node, context)
+            return
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        method(node, context)
+        timing = rule_times[rule_id]
+        timing[0] += time.perf_counter() - wall_start
+        timing[1] += time.process_time() - cpu_start
+        timing[2] += 1
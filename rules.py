@@ -0,0 +1,226 @@
+import ast
+from rule_engine import AnalysisContext, Rule, RuleRegistry
+from parsed_source import ParsedSource
+from issues import Issue, rule_info
+
+# Bump whenever a rule or security pattern changes its output, so cached results are invalidated
+RULESET_VERSION = '3'
+
+# Scope and name usage tracking
+
+class ScopeRule(Rule):
+    rule_id = 'scopes'
+    node_types = (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+
+    def visit(self, node, context):
+        if not isinstance(node, (ast.Module, ast.Lambda)):
+            # A def or class statement binds its name in the enclosing scope
+            context.record_binding(node.name)
+        context.enter_scope(node)
+
+    def leave(self, node, context):
+        context.exit_scope()
+
+class NameUsageRule(Rule):
+    rule_id = 'name_usage'
+    node_types = (ast.Name, ast.AugAssign, ast.arg, ast.AnnAssign, ast.FunctionDef, ast.AsyncFunctionDef,
+                  ast.Global, ast.Nonlocal, ast.ExceptHandler)
+
+    def visit(self, node, context):
+        if isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Load):
+                context.record_load(node.id)
+            else:
+                # Any binding makes the name local to the whole scope, hiding outer imports
+                context.record_binding(node.id)
+                if isinstance(node.ctx, ast.Del):
+                    context.record_load(node.id)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            context.record_outer_declaration(node.names)
+        elif isinstance(node, ast.ExceptHandler):
+            if node.name:
+                context.record_binding(node.name)
+        elif isinstance(node, ast.AugAssign):
+            # "x += 1" reads x before rebinding it
+            if isinstance(node.target, ast.Name):
+                context.record_load(node.target.id)
+        else:
+            if isinstance(node, ast.arg):
+                context.record_binding(node.arg)
+            is_function = isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+            annotation = node.returns if is_function else node.annotation
+            if annotation is not None:
+                self._record_string_annotation_loads(annotation, context)
+
+    def _record_string_annotation_loads(self, annotation, context):
+        """Record names used by forward references such as x: "Path" or List["Path"]"""
+        stack = [annotation]
+        while stack:
+            for child in ast.walk(stack.pop()):
+                if not (isinstance(child, ast.Constant) and isinstance(child.value, str)):
+                    continue
+                try:
+                    expression = ast.parse(child.value, mode='eval')
+                except (SyntaxError, ValueError, RecursionError):
+                    continue
+                for name in ast.walk(expression):
+                    if isinstance(name, ast.Name):
+                        context.record_load(name.id)
+                # A forward reference may itself contain quoted names
+                stack.append(expression)
+
+class ExportedNamesRule(Rule):
+    rule_id = 'exported_names'
+    node_types = (ast.Assign,)
+
+    def visit(self, node, context):
+        # Names listed in __all__ are re-exported and therefore used
+        if (any(isinstance(target, ast.Name) and target.id == '__all__' for target in node.targets) and
+            isinstance(node.value, (ast.List, ast.Tuple))):
+            for element in node.value.elts:
+                if isinstance(element, ast.Constant) and isinstance(element.value, str):
+                    context.record_load(element.value)
+
+# Efficiency rules
+
+class FunctionCountRule(Rule):
+    rule_id = 'function_count'
+    node_types = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+    def visit(self, node, context):
+        context.stats['function_count'] += 1
+
+class ImportRule(Rule):
+    rule_id = 'imports'
+    node_types = (ast.Import, ast.ImportFrom)
+
+    def visit(self, node, context):
+        context.stats['import_count'] += len(node.names)
+
+        for alias in node.names:
+            if alias.name != '*':
+                context.record_binding(alias.asname or alias.name.split('.')[0])
+            record = {
+                'name': alias.name,
+                'alias': alias.asname,
+                # "import a.b" binds "a" in the enclosing scope
+                'bound_name': alias.asname or alias.name.split('.')[0],
+                'scope': context.current_scope,
+                'line': node.lineno,
+                'type': 'import'
+            }
+            if isinstance(node, ast.ImportFrom):
+                record['module'] = node.module
+                record['type'] = 'from_import'
+            context.imports.append(record)
+
+class WhileLoopRule(Rule):
+    rule_id = 'while_loop'
+    node_types = (ast.While,)
+    info = rule_info(
+        'while_loop', 'while_loop',
+        'While loop detected - consider if for-loop or list comprehension is more appropriate',
+        'Replace with for-loop or list comprehension when possible'
+    )
+
+    def visit(self, node, context):
+        context.stats['while_loop_count'] += 1
+        context.add_issue(self.category, Issue(self.info, node.lineno))
+
+class ForLoopRule(Rule):
+    rule_id = 'for_loop'
+    node_types = (ast.For,)
+
+    def visit(self, node, context):
+        context.stats['for_loop_count'] += 1
+
+class NestingDepthRule(Rule):
+    rule_id = 'nesting_depth'
+    node_types = (ast.FunctionDef, ast.AsyncFunctionDef, ast.While, ast.For)
+
+    def visit(self, node, context):
+        context.enter_block()
+
+    def leave(self, node, context):
+        context.exit_block()
+
+# Security rules
+
+class DangerousFunctionRule(Rule):
+    rule_id = 'dangerous_function'
+    category = 'security'
+    node_types = (ast.Call,)
+    infos = {
+        func_name: rule_info(
+            f'dangerous_function_{func_name}', 'security_vulnerability',
+            f'Dangerous function {func_name}() usage detected',
+            f'Avoid using {func_name}() as it can execute arbitrary code',
+            subtype=f'dangerous_function_{func_name}', severity='HIGH'
+        )
+        for func_name in ('eval', 'exec', 'compile')
+    }
+
+    def visit(self, node, context):
+        if isinstance(node.func, ast.Name) and node.func.id in self.infos:
+            context.add_issue(self.category, Issue(self.infos[node.func.id], node.lineno))
+
+class SubprocessShellRule(Rule):
+    rule_id = 'subprocess_shell_true'
+    category = 'security'
+    node_types = (ast.Call,)
+    info = rule_info(
+        'subprocess_shell_true', 'security_vulnerability',
+        'subprocess called with shell=True - command injection risk',
+        'Use shell=False and pass command as list of arguments',
+        subtype='subprocess_shell_true', severity='HIGH'
+    )
+
+    def visit(self, node, context):
+        if (isinstance(node.func, ast.Attribute) and
+            isinstance(node.func.value, ast.Name) and
+            node.func.value.id == 'subprocess' and
+            any(keyword.arg == 'shell' and
+                isinstance(keyword.value, ast.Constant) and
+                keyword.value.value is True
+                for keyword in node.keywords)):
+            context.add_issue(self.category, Issue(self.info, node.lineno))
+
+class AssertRule(Rule):
+    rule_id = 'assert_statement'
+    category = 'security'
+    node_types = (ast.Assert,)
+    info = rule_info(
+        'assert_statement', 'security_vulnerability',
+        'Assert statement used - can be disabled with -O flag',
+        'Use proper exception handling instead of assert for security checks',
+        subtype='assert_statement', severity='LOW'
+    )
+
+    def visit(self, node, context):
+        context.add_issue(self.category, Issue(self.info, node.lineno))
+
+def build_default_registry() -> RuleRegistry:
+    """Create a registry containing all built-in rules"""
+    registry = RuleRegistry()
+    for rule_class in (ScopeRule, NameUsageRule, ExportedNamesRule, FunctionCountRule,
+                       ImportRule, WhileLoopRule, ForLoopRule, NestingDepthRule,
+                       DangerousFunctionRule, SubprocessShellRule, AssertRule):
+        registry.register(rule_class())
+    return registry
+
+DEFAULT_REGISTRY = build_default_registry()
+
+def run_rules(source: ParsedSource, registry: RuleRegistry = None) -> AnalysisContext:
+    """Run all rules over a parsed source, reusing the result if already computed"""
+    registry = registry or DEFAULT_REGISTRY
+
+    context = source.rule_contexts.get(registry)
+    if context is None:
+        context = AnalysisContext()
+        if source.is_valid:
+            registry.run(source.tree, context, source.profiler, source.limits.max_nodes, source.deadline)
+            if context.partial_reason is not None:
+                source.mark_partial(context.partial_reason)
+        source.rule_contexts[registry] = context
+
+    return context
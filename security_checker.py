@@ -1,102 +1,142 @@
 import re
-import ast
-from typing import List, Dict, Any
+import time
+from bisect import bisect_right
+from typing import List, Dict, Any, Optional, Union
+from parsed_source import ParsedSource
+from rules import RULESET_VERSION, run_rules
+from analysis_cache import AnalysisCache
+from issues import Issue, rule_info
 
 class SecurityChecker:
     """Detects security vulnerabilities and risky patterns in Python code"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[AnalysisCache] = None):
+        self.cache = cache
         self.security_patterns = {
             'eval_usage': {
                 'pattern': r'\beval\s*\(',
+                'keywords': ['eval'],
                 'severity': 'HIGH',
                 'description': 'Use of eval() function detected - major security risk',
                 'suggestion': 'Avoid eval(). Use literal_eval() for safe evaluation or ast.parse() for code analysis'
             },
             'exec_usage': {
                 'pattern': r'\bexec\s*\(',
+                'keywords': ['exec'],
                 'severity': 'HIGH', 
                 'description': 'Use of exec() function detected - code injection risk',
                 'suggestion': 'Avoid exec(). Consider safer alternatives like importlib for dynamic imports'
             },
             'hardcoded_password': {
                 'pattern': r'(password|passwd|pwd)\s*=\s*["\'][^"\']+["\']',
+                'keywords': ['password', 'passwd', 'pwd'],
                 'severity': 'HIGH',
                 'description': 'Hardcoded password detected',
                 'suggestion': 'Use environment variables or secure configuration files for credentials'
             },
             'hardcoded_secret': {
                 'pattern': r'(secret|token|key|api_key)\s*=\s*["\'][^"\']{8,}["\']',
+                'keywords': ['secret', 'token', 'key'],
                 'severity': 'HIGH',
                 'description': 'Hardcoded secret/token detected',
                 'suggestion': 'Store secrets in environment variables or secure vault systems'
             },
             'sql_injection_risk': {
                 'pattern': r'\.execute\s*\(\s*["\'].*%.*["\']',
+                'keywords': ['.execute'],
                 'severity': 'MEDIUM',
                 'description': 'Potential SQL injection vulnerability',
                 'suggestion': 'Use parameterized queries instead of string formatting in SQL'
             },
             'shell_injection': {
                 'pattern': r'(os\.system|subprocess\.call|subprocess\.run)\s*\([^)]*\+',
+                'keywords': ['os.system', 'subprocess.'],
                 'severity': 'HIGH',
                 'description': 'Potential shell injection via command concatenation',
                 'suggestion': 'Use subprocess with list arguments instead of string concatenation'
             },
             'pickle_usage': {
                 'pattern': r'\bpickle\.loads?\s*\(',
+                'keywords': ['pickle.'],
                 'severity': 'MEDIUM',
                 'description': 'Pickle deserialization can be unsafe with untrusted data',
                 'suggestion': 'Use JSON or other safe serialization formats for untrusted data'
             },
             'temp_file_unsafe': {
                 'pattern': r'open\s*\(\s*["\']\/tmp\/',
+                'keywords': ['/tmp/'],
                 'severity': 'LOW',
                 'description': 'Unsafe temporary file usage',
                 'suggestion': 'Use tempfile module for secure temporary file creation'
             },
             'weak_random': {
                 'pattern': r'random\.(random|randint|choice)',
+                'keywords': ['random.'],
                 'severity': 'LOW',
                 'description': 'Using weak random number generator for security purposes',
                 'suggestion': 'Use secrets module for cryptographically strong random numbers'
             },
             'debug_mode': {
                 'pattern': r'debug\s*=\s*True',
+                'keywords': ['debug'],
                 'severity': 'MEDIUM',
                 'description': 'Debug mode enabled - may expose sensitive information',
                 'suggestion': 'Disable debug mode in production environments'
             }
         }
+        
+        # Each pattern can only match a line containing one of its (lowercase) keywords,
+        # so a single keyword scan over the whole file finds the few lines worth checking
+        self._rule_infos = {
+            issue_type: rule_info(issue_type, 'security_vulnerability', pattern_info['description'],
+                                  pattern_info['suggestion'], subtype=issue_type,
+                                  severity=pattern_info['severity'])
+            for issue_type, pattern_info in self.security_patterns.items()
+        }
+        self._compiled_patterns = {
+            issue_type: re.compile(pattern_info['pattern'], re.IGNORECASE)
+            for issue_type, pattern_info in self.security_patterns.items()
+        }
+        all_keywords = sorted({keyword for pattern_info in self.security_patterns.values()
+                               for keyword in pattern_info['keywords']}, key=len, reverse=True)
+        self._keyword_regex = re.compile('|'.join(re.escape(keyword) for keyword in all_keywords),
+                                         re.IGNORECASE)
     
-    def analyze_security(self, code: str) -> Dict[str, Any]:
+    def analyze_security(self, code: Union[str, ParsedSource]) -> Dict[str, Any]:
         """Analyze code for security vulnerabilities"""
-        security_issues = []
+        source = ParsedSource.ensure(code)
+        
+        # Oversized input is rejected outright, before it is hashed or parsed
+        source.check_limits()
+        
+        cache_key = None
+        if self.cache is not None:
+            cache_key = AnalysisCache.make_key('security', RULESET_VERSION, source.content_hash)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
         
         # Pattern-based detection
-        lines = code.split('\n')
-        for line_num, line in enumerate(lines, 1):
-            for issue_type, pattern_info in self.security_patterns.items():
-                if re.search(pattern_info['pattern'], line, re.IGNORECASE):
-                    security_issues.append({
-                        'type': 'security_vulnerability',
-                        'subtype': issue_type,
-                        'line': line_num,
-                        'severity': pattern_info['severity'],
-                        'description': pattern_info['description'],
-                        'suggestion': pattern_info['suggestion'],
-                        'code_snippet': line.strip()
-                    })
+        security_issues = self._scan_patterns(source)
         
         # AST-based analysis for more complex patterns
-        try:
-            tree = ast.parse(code)
-            ast_issues = self._analyze_ast_security(tree)
+        # Skipped if the code has syntax errors
+        if source.is_valid:
+            ast_issues = self._analyze_ast_security(source)
             security_issues.extend(ast_issues)
-        except SyntaxError:
-            pass  # Skip AST analysis if code has syntax errors
         
-        # Calculate security score
+        results = self.build_results(security_issues)
+        
+        if source.partial_reason is not None:
+            results['partial'] = True
+            results['partial_reason'] = source.partial_reason
+        elif cache_key is not None:
+            self.cache.set(cache_key, results)
+        
+        return results
+    
+    def build_results(self, security_issues: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Score the found issues and assemble the security analysis dictionary"""
         security_score = self._calculate_security_score(security_issues)
         
         return {
@@ -109,54 +149,56 @@ class SecurityChecker:
             'low_risk_count': len([i for i in security_issues if i.get('severity') == 'LOW'])
         }
     
-    def _analyze_ast_security(self, tree: ast.AST) -> List[Dict[str, Any]]:
+    def _scan_patterns(self, source: ParsedSource) -> List[Issue]:
+        """Run the line-based security patterns over lines that contain a trigger keyword"""
+        security_issues = []
+        profiler = source.profiler
+        
+        if profiler is not None:
+            with profiler.stage('security.prefilter'):
+                candidate_lines = self._find_candidate_lines(source)
+            profiler.count('security.prefilter', 'lines_scanned', len(source.lines))
+        else:
+            candidate_lines = self._find_candidate_lines(source)
+        
+        for index, line_num in enumerate(candidate_lines, 1):
+            if not index & 1023 and source.budget_exhausted():
+                break
+            line = source.line(line_num)
+            lowered = line.lower()
+            for issue_type, pattern_info in self.security_patterns.items():
+                if not any(keyword in lowered for keyword in pattern_info['keywords']):
+                    continue
+                if profiler is not None:
+                    wall_start, cpu_start = time.perf_counter(), time.process_time()
+                    matched = self._compiled_patterns[issue_type].search(line)
+                    profiler.add_time(f"regex.{issue_type}", time.perf_counter() - wall_start,
+                                      time.process_time() - cpu_start)
+                    profiler.count(f"regex.{issue_type}", 'lines_scanned')
+                else:
+                    matched = self._compiled_patterns[issue_type].search(line)
+                if matched:
+                    security_issues.append(Issue(self._rule_infos[issue_type], line_num,
+                                                 code_snippet=line.strip()))
+        
+        return security_issues
+    
+    def _find_candidate_lines(self, source: ParsedSource) -> List[int]:
+        """Get line numbers containing at least one security pattern keyword"""
+        line_offsets = source.line_offsets
+        candidates = []
+        
+        for match in self._keyword_regex.finditer(source.code):
+            line_num = bisect_right(line_offsets, match.start())
+            if not candidates or candidates[-1] != line_num:
+                candidates.append(line_num)
+        
+        return candidates
+    
+    def _analyze_ast_security(self, source: ParsedSource) -> List[Dict[str, Any]]:
         """Perform AST-based security analysis"""
-        issues = []
-        
-        for node in ast.walk(tree):
-            # Check for dangerous function calls
-            if isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Name):
-                    func_name = node.func.id
-                    if func_name in ['eval', 'exec', 'compile']:
-                        issues.append({
-                            'type': 'security_vulnerability',
-                            'subtype': f'dangerous_function_{func_name}',
-                            'line': node.lineno,
-                            'severity': 'HIGH',
-                            'description': f'Dangerous function {func_name}() usage detected',
-                            'suggestion': f'Avoid using {func_name}() as it can execute arbitrary code'
-                        })
-                
-                # Check for subprocess with shell=True
-                elif isinstance(node.func, ast.Attribute):
-                    if (isinstance(node.func.value, ast.Name) and 
-                        node.func.value.id == 'subprocess' and
-                        any(keyword.arg == 'shell' and 
-                            isinstance(keyword.value, ast.Constant) and 
-                            keyword.value.value is True 
-                            for keyword in node.keywords)):
-                        issues.append({
-                            'type': 'security_vulnerability',
-                            'subtype': 'subprocess_shell_true',
-                            'line': node.lineno,
-                            'severity': 'HIGH',
-                            'description': 'subprocess called with shell=True - command injection risk',
-                            'suggestion': 'Use shell=False and pass command as list of arguments'
-                        })
-            
-            # Check for assert statements (can be disabled in production)
-            elif isinstance(node, ast.Assert):
-                issues.append({
-                    'type': 'security_vulnerability',
-                    'subtype': 'assert_statement',
-                    'line': node.lineno,
-                    'severity': 'LOW',
-                    'description': 'Assert statement used - can be disabled with -O flag',
-                    'suggestion': 'Use proper exception handling instead of assert for security checks'
-                })
-        
-        return issues
+        # Security rules run in the same traversal as the efficiency rules
+        return list(run_rules(source).issues['security'])
     
     def _calculate_security_score(self, issues: List[Dict[str, Any]]) -> int:
         """Calculate security score based on found issues"""
@@ -1,5 +1,4 @@
 import streamlit as st
-import ast
 import io
 import json
 from datetime import datetime
@@ -13,6 +12,10 @@ from gamification import GamificationEngine
 from security_checker import SecurityChecker
 from ai_refactor import AIRefactorEngine
 from carbon_calculator import CarbonCalculator
+from parsed_source import ParsedSource
+from limits import InputTooLargeError, NODE_LIMIT_REACHED
+from analysis_cache import get_shared_cache
+from instrumentation import Profiler, timed_stage, timing_histograms
 import plotly.graph_objects as go
 
 # Disable complex dependencies to avoid numpy issues
@@ -54,6 +57,7 @@ def main():
     with st.sidebar:
         st.header("⚙️ Settings")
         username = st.text_input("Your Name (for report)", value="Developer")
+        profile_enabled = st.checkbox("⏱️ Record timing breakdown", value=False)
         
         st.header("📋 Quick Actions")
         sample_types = get_all_sample_types()
@@ -72,6 +76,9 @@ def main():
                     st.write(f"**Level:** {level_info['level_name']}")
                     st.write(f"**Best Score:** {user_stats['best_score']}/100")
                     st.write(f"**Analyses:** {user_stats['total_analyses']}")
+                    position = st.session_state.history_tracker.get_leaderboard_position(username)
+                    if position:
+                        st.write(f"**Rank:** #{position['rank']}")
                     
                     if level_info['next_level']:
                         progress_bar = st.progress(level_info['progress_to_next'] / 100)
@@ -85,7 +92,8 @@ def main():
         if leaderboard:
             for i, leader in enumerate(leaderboard, 1):
                 emoji = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else "🏆"
-                st.write(f"{emoji} **{leader['username']}** - Avg: {leader['average_score']:.1f}/100")
+                st.write(f"{emoji} **{leader['username']}** - Score: {leader['composite_score']:.1f} "
+                         f"(Avg: {leader['average_score']:.1f}/100)")
         
         st.header("ℹ️ About")
         st.markdown("""
@@ -130,44 +138,64 @@ def main():
         
         if analyze_button and code_input.strip():
             try:
-                # Validate Python syntax
-                ast.parse(code_input)
+                # Parsed lazily, so cached code is never parsed; analyze() raises SyntaxError for invalid code
+                profiler = Profiler() if profile_enabled else None
+                parsed_source = ParsedSource(code_input, profiler=profiler)
+                parsed_source.check_limits()
                 
                 # Initialize components
-                analyzer = CodeAnalyzer()
+                analyzer = CodeAnalyzer(cache=get_shared_cache())
                 suggestion_engine = SuggestionEngine()
                 visualizer = CodeVisualization()
-                security_checker = SecurityChecker()
+                security_checker = SecurityChecker(cache=get_shared_cache())
                 ai_refactor = AIRefactorEngine()
                 carbon_calc = CarbonCalculator()
                 
                 # Analyze code
                 with st.spinner("Analyzing your code..."):
-                    analysis_results = analyzer.analyze(code_input)
+                    analysis_results = analyzer.analyze(parsed_source)
                     suggestions = suggestion_engine.generate_suggestions(analysis_results)
-                    green_score = analyzer.calculate_green_score(analysis_results)
-                    security_analysis = security_checker.analyze_security(code_input)
+                    with timed_stage(profiler, 'scoring'):
+                        green_score = analyzer.calculate_green_score(analysis_results)
+                    security_analysis = security_checker.analyze_security(parsed_source)
+                
+                if parsed_source.partial_reason is not None:
+                    reason = ("its syntax tree is too large" if parsed_source.partial_reason == NODE_LIMIT_REACHED
+                              else "the analysis time budget ran out")
+                    st.warning(f"⚠️ Partial results: analysis stopped early because {reason}. "
+                               "Scores below may be incomplete.")
                 
                 # Calculate additional metrics for database storage
-                energy_data = carbon_calc.calculate_energy_consumption(analysis_results)
-                carbon_data = carbon_calc.calculate_carbon_footprint(energy_data)
+                with timed_stage(profiler, 'carbon'):
+                    energy_data = carbon_calc.calculate_energy_consumption(analysis_results)
+                    carbon_data = carbon_calc.calculate_carbon_footprint(energy_data)
                 
                 # Store in history with enhanced data
-                st.session_state.history_tracker.add_analysis(
-                    username, green_score, analysis_results, code_input[:100],
-                    security_analysis['security_score'],
-                    energy_data['total_energy_uj'],
-                    carbon_data['carbon_emissions_g']
-                )
+                with timed_stage(profiler, 'db_write'):
+                    st.session_state.history_tracker.add_analysis(
+                        username, green_score, analysis_results, code_input[:100],
+                        security_analysis['security_score'],
+                        energy_data['total_energy_uj'],
+                        carbon_data['carbon_emissions_g']
+                    )
                 
                 # Display results with enhanced visualizations
                 display_enhanced_results(analysis_results, suggestions, green_score, 
-                                       security_analysis, visualizer, username, carbon_calc)
+                                       security_analysis, visualizer, username, carbon_calc, profiler)
+                
+                if profiler is not None:
+                    analysis_results['timings'] = profiler.as_dict()
+                    timing_histograms.record(analysis_results['timings'])
+                    with st.expander("⏱️ Timing Breakdown"):
+                        st.write("**This analysis (per stage):**")
+                        st.json(analysis_results['timings'])
+                        st.write("**All profiled analyses in this process:**")
+                        st.json(timing_histograms.summary())
                 
                 # Show AI refactoring suggestions
                 if st.button("🤖 Generate AI Refactor Suggestions", use_container_width=True):
                     with st.spinner("Generating optimized code..."):
-                        refactor_results = ai_refactor.generate_refactored_code(code_input, analysis_results)
+                        refactor_results = ai_refactor.generate_refactored_code(parsed_source, analysis_results)
                         display_refactor_suggestions(refactor_results)
                 
                 # Generate and offer report download
@@ -194,6 +222,9 @@ def main():
                         badge_text = st.session_state.gamification.get_level_badge_text(level_info, user_stats)
                         st.text_area("Copy this text to share on LinkedIn:", badge_text, height=200)
                 
+            except InputTooLargeError as e:
+                st.error(f"❌ **Input Too Large:** {str(e)}")
+                st.error("Please analyze a smaller file or split the code into parts.")
             except SyntaxError as e:
                 st.error(f"❌ **Syntax Error:** {str(e)}")
                 st.error("Please check your Python code for syntax errors.")
@@ -204,7 +235,7 @@ def main():
         elif analyze_button:
             st.warning("⚠️ Please enter some Python code to analyze.")
 
-def display_enhanced_results(analysis_results, suggestions, green_score, security_analysis, visualizer, username, carbon_calc):
+def display_enhanced_results(analysis_results, suggestions, green_score, security_analysis, visualizer, username, carbon_calc, profiler=None):
     """Display enhanced analysis results with visualizations and gamification"""
     
     # Create tabs for different views
@@ -215,7 +246,8 @@ def display_enhanced_results(analysis_results, suggestions, green_score, securit
         col1, col2 = st.columns([1, 1])
         
         with col1:
-            gauge_fig = visualizer.create_green_score_gauge(green_score)
+            with timed_stage(profiler, 'figures'):
+                gauge_fig = visualizer.create_green_score_gauge(green_score)
             st.plotly_chart(gauge_fig, use_container_width=True)
         
         with col2:
@@ -226,15 +258,18 @@ def display_enhanced_results(analysis_results, suggestions, green_score, securit
         col1, col2 = st.columns(2)
         
         with col1:
-            stats_chart = visualizer.create_code_stats_chart(analysis_results)
+            with timed_stage(profiler, 'figures'):
+                stats_chart = visualizer.create_code_stats_chart(analysis_results)
             st.plotly_chart(stats_chart, use_container_width=True)
         
         with col2:
-            issues_chart = visualizer.create_issues_pie_chart(analysis_results)
+            with timed_stage(profiler, 'figures'):
+                issues_chart = visualizer.create_issues_pie_chart(analysis_results)
             st.plotly_chart(issues_chart, use_container_width=True)
         
         # Complexity Radar
-        complexity_radar = visualizer.create_complexity_radar(analysis_results)
+        with timed_stage(profiler, 'figures'):
+            complexity_radar = visualizer.create_complexity_radar(analysis_results)
         st.plotly_chart(complexity_radar, use_container_width=True)
     
     with tab2:
@@ -494,20 +529,38 @@ def display_enhanced_results(analysis_results, suggestions, green_score, securit
                     st.metric("Total Analyses", analytics.get('total_analyses', 0))
                 with col3:
                     st.metric("Platform Avg Score", f"{analytics.get('average_platform_score', 0):.1f}/100")
+                if analytics.get('refreshed_at'):
+                    st.caption(f"Platform totals as of {analytics['refreshed_at']:%Y-%m-%d %H:%M} UTC")
+                
+                with st.expander("🔌 Connection Pool"):
+                    pool_metrics = st.session_state.history_tracker.db_manager.get_pool_metrics()
+                    wait = pool_metrics.get('checkout_wait', {})
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("Checked Out", pool_metrics.get('checked_out', 0))
+                    with col2:
+                        st.metric("Checkout Wait p99", f"{wait.get('p99_ms', 0):.1f} ms")
+                    with col3:
+                        st.metric("Pool Timeouts", pool_metrics.get('timeouts', 0))
+                    st.json(pool_metrics)
+                    if st.session_state.history_tracker.write_queue is not None:
+                        st.write("**Write-behind queue:**")
+                        st.json(st.session_state.history_tracker.write_queue.stats())
                 
                 # Global leaderboard
                 st.subheader("🏆 Global Leaderboard")
                 leaderboard = st.session_state.history_tracker.get_leaderboard(10)
                 if leaderboard:
                     # Create a simple table display
-                    st.write("| Rank | Username | Avg Score | Best Score | Total Analyses |")
-                    st.write("|------|----------|-----------|------------|----------------|")
+                    st.write("| Rank | Username | Score | Avg Score | Best Score | Total Analyses |")
+                    st.write("|------|----------|-------|-----------|------------|----------------|")
                     for i, leader in enumerate(leaderboard, 1):
+                        composite = leader.get('composite_score', 0)
                         avg_score = leader.get('average_score', 0)
                         best_score = leader.get('best_score', 0)
                         total_analyses = leader.get('total_analyses', 0)
-                        username = leader.get('username', 'Unknown')
-                        st.write(f"| {i} | {username} | {avg_score:.1f} | {best_score} | {total_analyses} |")
+                        leader_name = leader.get('username', 'Unknown')
+                        st.write(f"| {i} | {leader_name} | {composite:.1f} | {avg_score:.1f} | {best_score} | {total_analyses} |")
                 else:
                     st.info("No leaderboard data available yet.")
                 
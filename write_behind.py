@@ -0,0 +1,179 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Put on the queue by close() to tell the worker to flush and exit
+_STOP = object()
+
+class WriteBehindQueue:
+    """Bounded queue that persists analyses in batches on a background thread
+
+    submit() returns as soon as the record is queued. The worker writes a batch
+    with save_analyses_bulk when it holds flush_size records or flush_interval
+    seconds after the batch's first record arrived, whichever comes first. When
+    the queue is full, submit() blocks for up to put_timeout seconds and then
+    returns False, so the caller can write synchronously instead of dropping the
+    record. When a batch fails as a whole, each of its records is retried on its
+    own, so one bad record or a transient error cannot lose the rest of the batch.
+    """
+
+    def __init__(self, db_manager, max_size: int = 10000, flush_size: int = 200,
+                 flush_interval: float = 0.5, put_timeout: float = 2.0, retry_delay: float = 0.1):
+        self.db_manager = db_manager
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue(maxsize=max_size)
+        self._done = threading.Condition()
+        self._closed = False
+        self.counters = {'submitted': 0, 'saved': 0, 'failed': 0, 'rejected': 0, 'batches': 0, 'retried': 0}
+
+        self._worker = threading.Thread(target=self._run, name='greencode-write-behind', daemon=True)
+        self._worker.start()
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """Queue a save_analyses_bulk record; False if the queue is closed or stayed full"""
+        with self._done:
+            if self._closed:
+                return False
+            # Count before putting so flush() never sees a completion it has not counted
+            self.counters['submitted'] += 1
+        # Snapshot the record, so the caller changing it after submit() cannot alter what is saved
+        record = dict(record)
+        if isinstance(record.get('analysis_results'), dict):
+            record['analysis_results'] = dict(record['analysis_results'])
+        try:
+            self._queue.put(record, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            with self._done:
+                self.counters['submitted'] -= 1
+                self.counters['rejected'] += 1
+            return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every record submitted so far is written; False on timeout"""
+        with self._done:
+            target = self.counters['submitted']
+            return self._done.wait_for(
+                lambda: self.counters['saved'] + self.counters['failed'] >= target, timeout
+            )
+
+    def close(self, timeout: Optional[float] = 30.0) -> bool:
+        """Stop accepting records, write everything still queued and stop the worker"""
+        with self._done:
+            if self._closed:
+                return not self._worker.is_alive()
+            self._closed = True
+        self._queue.put(_STOP)
+        self._worker.join(timeout)
+        if self._worker.is_alive():
+            return False
+
+        # A submit racing with close can land behind the stop marker
+        leftovers = []
+        while True:
+            try:
+                leftovers.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftovers:
+            self._write(leftovers)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._done:
+            stats = dict(self.counters)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.flush_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            self._write(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        statuses = self._save(batch)
+        if statuses is None:
+            # The whole batch was rolled back; retry record by record so only bad ones are lost
+            time.sleep(self.retry_delay)
+            with self._done:
+                self.counters['retried'] += len(batch)
+            statuses = [status for record in batch
+                        for status in (self._save([record]) or [{'status': 'error'}])]
+        saved = sum(1 for status in statuses if status['status'] == 'saved')
+
+        failed = len(batch) - saved
+        if failed:
+            logger.error(f"{failed} of {len(batch)} queued analyses could not be saved")
+        with self._done:
+            self.counters['saved'] += saved
+            self.counters['failed'] += failed
+            self.counters['batches'] += 1
+            self._done.notify_all()
+
+    def _save(self, records: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """save_analyses_bulk's statuses, or None if the write failed as a whole"""
+        try:
+            statuses = self.db_manager.save_analyses_bulk(records, chunk_size=len(records))
+        except Exception as e:
+            # The worker must survive anything the database layer raises
+            logger.error(f"Error writing queued analyses: {e}")
+            return None
+        if len(records) > 1 and all(status['status'] == 'error' for status in statuses):
+            return None
+        return statuses
+
+# One queue, and so one worker thread, per database for the whole process
+_queues: Dict[str, WriteBehindQueue] = {}
+_queues_lock = threading.Lock()
+
+def write_behind_enabled() -> bool:
+    return os.getenv('GREENCODE_WRITE_BEHIND', '1') != '0'
+
+def get_write_behind_queue(db_manager) -> WriteBehindQueue:
+    """The process-wide queue for db_manager's database, configured by GREENCODE_WRITE_* variables"""
+    with _queues_lock:
+        write_queue = _queues.get(db_manager.database_url)
+        if write_queue is None:
+            write_queue = WriteBehindQueue(
+                db_manager,
+                max_size=int(os.getenv('GREENCODE_WRITE_QUEUE_SIZE', '10000')),
+                flush_size=int(os.getenv('GREENCODE_WRITE_BATCH_SIZE', '200')),
+                flush_interval=float(os.getenv('GREENCODE_WRITE_FLUSH_INTERVAL', '0.5')),
+                put_timeout=float(os.getenv('GREENCODE_WRITE_PUT_TIMEOUT', '2.0'))
+            )
+            _queues[db_manager.database_url] = write_queue
+        return write_queue
+
+@atexit.register
+def close_write_behind_queues():
+    """Drain every queue before the interpreter exits"""
+    with _queues_lock:
+        write_queues = list(_queues.values())
+    for write_queue in write_queues:
+        write_queue.close()